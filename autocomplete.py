@@ -0,0 +1,187 @@
+# backend/autocomplete.py
+# In-memory typeahead index for /autocomplete; the request path never touches SQLite.
+#
+#  - Every game contributes normalized keys: its name, each word-start suffix of
+#    the name ("witcher 3" for "The Witcher 3") and its slug. All keys sit in one
+#    sorted list, so a prefix is a bisect range.
+#  - Results are ranked like /games (game_cards.sort_top: metascore, rating, name).
+#    Prefixes matching more than HEAVY_RANGE keys get their top results
+#    precomputed; anything narrower is ranked on the fly from a small range.
+#  - A daemon thread polls PRAGMA data_version on its own connection and applies
+#    the cards updated since the last load; deletions, a swapped database file
+#    or a full read-model rebuild (read_models_state.rebuilds: rebuild_all and
+#    migrations re-render cards without moving updated_at) trigger a full reload. Each update publishes a new immutable snapshot, so
+#    readers never take a lock.
+
+from __future__ import annotations
+
+import heapq
+import os
+import re
+import sqlite3
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from db_pool import DataWatcher
+
+AUTOCOMPLETE_MAX  = int(os.environ.get("LG_AUTOCOMPLETE_MAX", 10))       # result cap per request
+AUTOCOMPLETE_POLL = float(os.environ.get("LG_AUTOCOMPLETE_POLL", 1.0))   # seconds between data_version checks
+HEAVY_RANGE = 256   # prefixes with more keys than this get precomputed results
+
+ROWS_SQL = """
+    SELECT id, slug, name, sort_top, updated_at,
+           json_object('id', id, 'slug', slug, 'name', name, 'released', released,
+                       'rating', rating, 'metascore_number', metascore_number) AS doc
+    FROM game_cards
+"""
+
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase, strip accents, collapse everything that isn't a letter/digit to single spaces."""
+    text = text or ""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def game_keys(name: Optional[str], slug: Optional[str]) -> Tuple[str, ...]:
+    norm = normalize(name)
+    words = norm.split(" ") if norm else []
+    keys = {" ".join(words[i:]) for i in range(len(words))}
+    if slug:
+        keys.add(normalize(slug))
+    keys.discard("")
+    return tuple(sorted(keys))
+
+
+class _Game:
+    __slots__ = ("rank", "doc", "keys")
+
+    def __init__(self, row: sqlite3.Row):
+        self.rank = row["sort_top"] or ""
+        self.keys = game_keys(row["name"], row["slug"])
+        self.doc = row["doc"].encode("utf-8")
+
+
+class _Snapshot:
+    """Immutable once published."""
+
+    def __init__(self, games: Dict[int, _Game], entries: List[Tuple[str, int]],
+                 top: Dict[str, List[int]], high_water: Optional[str]):
+        self.games = games
+        self.entries = entries        # sorted (key, game id)
+        self.top = top                # heavy prefix -> best AUTOCOMPLETE_MAX game ids
+        self.high_water = high_water  # max updated_at loaded
+
+    def range(self, prefix: str) -> Tuple[int, int]:
+        lo = bisect_left(self.entries, (prefix,))
+        hi = bisect_left(self.entries, (prefix + "\uffff",), lo)
+        return lo, hi
+
+    def best(self, lo: int, hi: int, k: int) -> List[int]:
+        ids = {gid for _, gid in self.entries[lo:hi]}
+        return heapq.nsmallest(k, ids, key=lambda gid: self.games[gid].rank)
+
+
+_EMPTY = _Snapshot({}, [], {}, None)
+
+
+class NameIndex(DataWatcher):
+    def __init__(self, path: str, poll: float = AUTOCOMPLETE_POLL):
+        super().__init__(path, poll)
+        self._snap = _EMPTY
+        self._reloads = 0
+        self._updates = 0
+
+    # --- lookups (request path) ---
+
+    def lookup(self, prefix: str, limit: int = AUTOCOMPLETE_MAX) -> bytes:
+        """JSON array of the best `limit` games whose name/slug has a key starting with prefix."""
+        p = normalize(prefix)
+        if not p or limit <= 0:
+            return b"[]"
+        snap = self._snap
+        ids = snap.top.get(p)
+        if ids is None:
+            lo, hi = snap.range(p)
+            ids = snap.best(lo, hi, limit)
+        return b"[" + b",".join(snap.games[gid].doc for gid in ids[:limit]) + b"]"
+
+    # --- loading ---
+
+    def reload(self, conn: sqlite3.Connection):
+        try:
+            rows = conn.execute(ROWS_SQL).fetchall()
+        except sqlite3.OperationalError:
+            rows = []   # no game_cards yet
+        games = {row["id"]: _Game(row) for row in rows}
+        entries = sorted((key, gid) for gid, game in games.items() for key in game.keys)
+        snap = _Snapshot(games, entries, {}, _high_water(rows, None))
+        # Heavy prefixes only extend heavy prefixes: walk down from one character
+        frontier = {key[:1] for key, _ in entries}
+        while frontier:
+            self._precompute(snap, frontier)
+            frontier = {key[:len(p) + 1] for p in frontier if p in snap.top
+                        for key, _ in snap.entries[slice(*snap.range(p))] if len(key) > len(p)}
+        self._snap = snap
+        self._reloads += 1
+
+    def update(self, conn: sqlite3.Connection):
+        old = self._snap
+        if old.high_water is None:
+            return self.reload(conn)
+        rows = conn.execute(f"{ROWS_SQL} WHERE updated_at >= ?", (old.high_water,)).fetchall()
+        count = conn.execute("SELECT COUNT(*) FROM game_cards").fetchone()[0]
+        games = dict(old.games)
+        games.update((row["id"], _Game(row)) for row in rows)
+        if len(games) != count:
+            # Something was deleted; a full reload is the only way to notice what
+            return self.reload(conn)
+
+        entries = list(old.entries)
+        touched = set()
+        for row in rows:
+            gid = row["id"]
+            before = old.games[gid].keys if gid in old.games else ()
+            for key in before:
+                i = bisect_left(entries, (key, gid))
+                if i < len(entries) and entries[i] == (key, gid):
+                    del entries[i]
+            touched.update(before)
+            touched.update(games[gid].keys)
+        for row in rows:
+            for key in games[row["id"]].keys:
+                entries.insert(bisect_left(entries, (key, row["id"])), (key, row["id"]))
+
+        snap = _Snapshot(games, entries, dict(old.top), _high_water(rows, old.high_water))
+        self._precompute(snap, {key[:n] for key in touched for n in range(1, len(key) + 1)})
+        self._snap = snap
+        self._updates += 1
+
+    def _precompute(self, snap: _Snapshot, prefixes: Iterable[str]):
+        """(Re)compute top results for the given prefixes that are heavy (or were)."""
+        for p in prefixes:
+            lo, hi = snap.range(p)
+            if hi - lo > HEAVY_RANGE:
+                snap.top[p] = snap.best(lo, hi, AUTOCOMPLETE_MAX)
+            else:
+                snap.top.pop(p, None)
+
+    def stats(self) -> dict:
+        snap = self._snap
+        return {
+            "games": len(snap.games),
+            "keys": len(snap.entries),
+            "precomputed_prefixes": len(snap.top),
+            "reloads": self._reloads,
+            "updates": self._updates,
+        }
+
+
+def _high_water(rows: List[sqlite3.Row], current: Optional[str]) -> Optional[str]:
+    return max((r["updated_at"] for r in rows if r["updated_at"]), default=current)
@@ -0,0 +1,199 @@
+# backend/build_suggestions.py
+# "More like this" suggestions computed locally from tags, genres and developers.
+#
+# Every game is a sparse vector over its features (tag, genre, developer),
+# IDF-weighted so tags almost every game has count for little, and
+# L2-normalized; cosine similarity is then a sparse matrix product. The top-K
+# neighbours go into `suggestions`, which get_game reads with one primary-key
+# range per game, and the affected detail blobs are re-rendered.
+#
+#   python build_suggestions.py              # every game
+#   python build_suggestions.py --changed    # games changed since the last run (+ games pointing at them)
+#   python build_suggestions.py --ids 21 24  # specific games
+#
+# Feature weights (IDF) come from the whole catalog on every run; incremental
+# runs only recompute the rows of the selected games, so run a full build now
+# and then (e.g. nightly) to pick up catalog-wide drift.
+
+import argparse, os, sqlite3, time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from dotenv import load_dotenv
+
+from changes import Expired, changed_since, watermark
+from materialize import ensure_cards, refresh_detail
+from migrations import NOW_SQL, migrate_file
+from schema_registry import SchemaCapabilities
+import publish
+import wal
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+DB_FILE = os.environ.get("LG_DB", "latestgames.db")
+
+TOP_K      = int(os.environ.get("LG_SUGGEST_TOP_K", 12))
+MIN_SCORE  = float(os.environ.get("LG_SUGGEST_MIN_SCORE", 0.05))
+MAX_DF     = float(os.environ.get("LG_SUGGEST_MAX_DF", 0.2))   # drop features on more than this share of games
+CHUNK_ROWS = 256                                               # games per similarity block (bounds memory)
+
+
+# (link table, feature column candidates, kind, weight): the first column present is used
+FEATURES = [
+    ("game_tags", ("tag", "tag_id"), "t", 1.0),
+    ("game_genres", ("genre_id",), "g", 0.5),
+    ("game_developers", ("developer", "developer_id"), "d", 1.5),
+]
+
+
+# --- Vectors ---
+
+def load_matrix(conn: sqlite3.Connection) -> Tuple[np.ndarray, sparse.csr_matrix]:
+    """(game ids, games x features CSR matrix with L2-normalized, IDF-weighted rows)."""
+    caps = SchemaCapabilities.load(conn)
+    ids = np.array([r[0] for r in conn.execute("SELECT id FROM games ORDER BY id")], dtype=np.int64)
+    row_of = {gid: i for i, gid in enumerate(ids.tolist())}
+    feature_of: Dict[Tuple[str, object], int] = {}
+    rows: List[int] = []
+    cols: List[int] = []
+    kind_weight: List[float] = []
+
+    for table, candidates, kind, weight in FEATURES:
+        col = next((c for c in candidates if caps.has(table, "game_id", c)), None)
+        if col is None:
+            continue
+        for gid, value in conn.execute(f"SELECT DISTINCT game_id, {col} FROM {table} WHERE {col} IS NOT NULL"):
+            i = row_of.get(gid)
+            if i is None:
+                continue
+            key = (kind, value.strip().lower() if isinstance(value, str) else value)
+            j = feature_of.setdefault(key, len(feature_of))
+            if j == len(kind_weight):
+                kind_weight.append(weight)
+            rows.append(i)
+            cols.append(j)
+
+    n, m = len(ids), len(feature_of)
+    x = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, m))
+    x.data[:] = 1.0   # duplicate (game, feature) pairs after lower() count once
+
+    df = np.bincount(x.indices, minlength=m)
+    idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+    idf[df > max(MAX_DF * n, 2)] = 0.0      # near-universal features only add noise and density
+    x = x @ sparse.diags(idf * np.asarray(kind_weight))
+    x.eliminate_zeros()
+
+    norms = np.sqrt(np.asarray(x.multiply(x).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return ids, sparse.csr_matrix(sparse.diags(1.0 / norms) @ x)
+
+
+def top_neighbours(ids: np.ndarray, x: sparse.csr_matrix, rows: np.ndarray,
+                   k: int = TOP_K, min_score: float = MIN_SCORE) -> Iterable[Tuple[int, List[Tuple[int, float]]]]:
+    """Yield (game id, [(suggested id, score), ...]) for the given row indices, best first."""
+    xt = x.T.tocsr()
+    for start in range(0, len(rows), CHUNK_ROWS):
+        block = rows[start:start + CHUNK_ROWS]
+        sims = (x[block] @ xt).tocsr()
+        for r, i in enumerate(block):
+            lo, hi = sims.indptr[r], sims.indptr[r + 1]
+            cand, score = sims.indices[lo:hi], sims.data[lo:hi]
+            keep = (cand != i) & (score >= min_score)
+            cand, score = cand[keep], score[keep]
+            if len(cand) > k:
+                part = np.argpartition(-score, k)[:k]
+                cand, score = cand[part], score[part]
+            # Best first; ties broken by id so reruns are stable
+            order = np.lexsort((ids[cand], -score))
+            yield int(ids[i]), [(int(ids[c]), round(float(s), 6)) for c, s in zip(cand[order], score[order])]
+
+
+# --- Writing ---
+
+def write_suggestions(conn: sqlite3.Connection, gid: int, neighbours: List[Tuple[int, float]]) -> bool:
+    """Replace one game's suggestions. Returns True when the list actually changed."""
+    old = conn.execute(
+        "SELECT suggested_game_id FROM suggestions WHERE game_id = ? ORDER BY position", (gid,)
+    ).fetchall()
+    if [r[0] for r in old] == [sid for sid, _ in neighbours]:
+        # Same games in the same order; refresh scores without re-rendering the blob
+        conn.executemany("UPDATE suggestions SET score = ? WHERE game_id = ? AND suggested_game_id = ?",
+                         [(score, gid, sid) for sid, score in neighbours])
+        return False
+    conn.execute("DELETE FROM suggestions WHERE game_id = ?", (gid,))
+    conn.executemany(
+        "INSERT INTO suggestions (game_id, position, suggested_game_id, score) VALUES (?, ?, ?, ?)",
+        [(gid, pos, sid, score) for pos, (sid, score) in enumerate(neighbours, start=1)],
+    )
+    return True
+
+
+def changed_games(conn: sqlite3.Connection) -> Optional[List[int]]:
+    """
+    Games changed since the last run plus the games suggesting them; None if
+    there was no run yet or the change log no longer reaches back that far.
+    """
+    row = conn.execute("SELECT built_at, change_seq FROM suggestions_state WHERE id = 1").fetchone()
+    if not row or not row[0]:
+        return None
+    if row[1] is None:
+        # Last run predates the change log
+        changed = [r[0] for r in conn.execute("SELECT id FROM games WHERE updated_at >= ?", (row[0],))]
+    else:
+        try:
+            changed, _ = changed_since(conn, row[1])
+        except Expired:
+            return None
+    pointing = set()
+    for gid in changed:
+        pointing.update(r[0] for r in conn.execute("SELECT game_id FROM suggestions WHERE suggested_game_id = ?", (gid,)))
+    return sorted(set(changed) | pointing)
+
+
+def build(db_path: str = DB_FILE, only: Optional[List[int]] = None, changed: bool = False) -> dict:
+    migrate_file(db_path)
+    # Detail blobs are re-rendered from the card rows, so those must exist
+    ensure_cards(db_path)
+    conn = wal.connect(db_path)
+    try:
+        started = conn.execute(f"SELECT {NOW_SQL}").fetchone()[0]
+        seq = watermark(conn)
+        if changed:
+            only = changed_games(conn)   # None -> first run, do everything
+
+        t0 = time.time()
+        ids, x = load_matrix(conn)
+        if only is None:
+            rows = np.arange(len(ids))
+            # Games that disappeared from the catalog
+            conn.execute("DELETE FROM suggestions WHERE game_id NOT IN (SELECT id FROM games)")
+        else:
+            rows = np.flatnonzero(np.isin(ids, np.array(only, dtype=np.int64)))
+
+        rerender = []
+        for gid, neighbours in top_neighbours(ids, x, rows):
+            if write_suggestions(conn, gid, neighbours):
+                rerender.append(gid)
+        # Detail blobs embed the suggestion cards
+        for gid in rerender:
+            refresh_detail(conn, gid)
+
+        conn.execute("INSERT OR REPLACE INTO suggestions_state (id, built_at, change_seq) VALUES (1, ?, ?)",
+                     (started, seq))
+        conn.commit()
+        return {"games": len(rows), "changed": len(rerender), "features": x.shape[1],
+                "seconds": round(time.time() - t0, 2)}
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Compute 'more like this' suggestions from tags/genres/developers.")
+    ap.add_argument("--db", default=DB_FILE)
+    ap.add_argument("--changed", action="store_true", help="only games updated since the last run")
+    ap.add_argument("--ids", type=int, nargs="+", help="only these game ids")
+    args = ap.parse_args()
+    stats = build(args.db, only=args.ids, changed=args.changed)
+    print(f"✅ Suggestions: {stats['games']} games scored, {stats['changed']} lists changed, "
+          f"{stats['features']} features, {stats['seconds']}s")
+    publish.after_batch(args.db)
@@ -0,0 +1,93 @@
+# backend/changes.py
+# The game change log (game_changes, filled by triggers; see migrations.py step 6).
+#
+#  - Every insert/update/delete on games or one of its child tables (links,
+#    media, stores, RAWG suggestions) bumps games.version and appends
+#    (seq, game_id, version, changed_at, kind). Consumers (exports, cache or
+#    CDN purges, build_suggestions --changed) keep the last seq they handled
+#    and ask for what came after it instead of rescanning the catalog.
+#  - prune(): compaction folds rows older than LG_CHANGES_COMPACT_HOURS into
+#    the newest row per game (still enough to know *which* games changed);
+#    retention drops everything older than LG_CHANGES_KEEP_DAYS. A watermark
+#    below the retention point gets Expired and must fall back to a full scan.
+#
+#   python changes.py             # prune LG_DB (run from cron, e.g. nightly)
+
+import os, sqlite3
+from typing import List, Tuple
+from dotenv import load_dotenv
+
+import wal
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+DB_FILE = os.environ.get("LG_DB", "latestgames.db")
+KEEP_DAYS     = float(os.environ.get("LG_CHANGES_KEEP_DAYS", 30))
+COMPACT_HOURS = float(os.environ.get("LG_CHANGES_COMPACT_HOURS", 24))
+
+CHANGES_SQL = """
+    SELECT c.seq, c.game_id, g.slug, c.version, c.changed_at, c.kind
+    FROM game_changes c LEFT JOIN games g ON g.id = c.game_id   -- slug is NULL once the game is deleted
+    WHERE c.seq > ? ORDER BY c.seq LIMIT ?;
+"""
+PRUNED_SQL = "SELECT pruned_through FROM game_changes_state WHERE id = 1;"
+
+
+class Expired(Exception):
+    """The watermark is older than the retained log; rescan everything."""
+
+
+def changes_since(conn: sqlite3.Connection, after: int, limit: int = 1000) -> List[sqlite3.Row]:
+    """Up to `limit` change rows after watermark `after`, oldest first."""
+    if after < conn.execute(PRUNED_SQL).fetchone()[0]:
+        raise Expired(f"changes up to seq {after} are no longer kept")
+    return conn.execute(CHANGES_SQL, (after, limit)).fetchall()
+
+
+def changed_since(conn: sqlite3.Connection, after: int) -> Tuple[List[int], int]:
+    """Distinct game ids changed after `after`, and the new watermark."""
+    ids, last = set(), after
+    while True:
+        rows = changes_since(conn, last)
+        if not rows:
+            return sorted(ids), last
+        ids.update(r[1] for r in rows)
+        last = rows[-1][0]
+
+
+HEAD_SQL = "SELECT seq FROM sqlite_sequence WHERE name = 'game_changes';"
+
+
+def watermark(conn: sqlite3.Connection) -> int:
+    """The newest seq handed out so far (0 for an empty log)."""
+    row = conn.execute(HEAD_SQL).fetchone()
+    return row[0] if row else 0
+
+
+def prune(conn: sqlite3.Connection, keep_days: float = KEEP_DAYS,
+          compact_hours: float = COMPACT_HOURS) -> dict:
+    """Apply retention, then compaction. Commits. Returns the row counts removed."""
+    keep_before = f"datetime('now', '-{keep_days * 86400:.0f} seconds')"
+    compact_before = f"datetime('now', '-{compact_hours * 3600:.0f} seconds')"
+    expired = conn.execute(f"SELECT max(seq) FROM game_changes WHERE changed_at < {keep_before}").fetchone()[0]
+    dropped = 0
+    if expired is not None:
+        dropped = conn.execute("DELETE FROM game_changes WHERE seq <= ?", (expired,)).rowcount
+        conn.execute("UPDATE game_changes_state SET pruned_through = max(pruned_through, ?) WHERE id = 1",
+                     (expired,))
+    compacted = conn.execute(f"""
+        DELETE FROM game_changes
+        WHERE changed_at < {compact_before}
+          AND seq < (SELECT max(seq) FROM game_changes c WHERE c.game_id = game_changes.game_id)
+    """).rowcount
+    conn.commit()
+    return {"dropped": dropped, "compacted": compacted}
+
+
+if __name__ == "__main__":
+    from migrations import migrate
+    conn = wal.connect(DB_FILE)
+    migrate(conn)
+    result = prune(conn)
+    left = conn.execute("SELECT COUNT(*) FROM game_changes").fetchone()[0]
+    print(f"✅ Change log: dropped {result['dropped']} expired, compacted {result['compacted']}, {left} rows kept")
+    conn.close()
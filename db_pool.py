@@ -0,0 +1,288 @@
+# backend/db_pool.py
+# Bounded pool of read-only, pre-tuned SQLite connections for the API.
+#
+#  - Connections are opened once with mode=ro + query_only and keep their page
+#    cache, mmap and prepared-statement cache across requests.
+#  - If the database file is replaced (new inode), idle connections are closed
+#    and busy ones are dropped on return, so readers move to the new file.
+#  - stats() reports saturation so we can size the pool from real traffic.
+#  - data_changed() tells callers (caches) when another connection committed.
+#  - DataWatcher: base for in-memory views (typeahead, facet bitsets) that
+#    reload/update themselves when the data or the file changes, or when a
+#    full read-model rebuild (read_models_state.rebuilds) rewrote the cards.
+#  - The file is in WAL mode (see wal.py), so readers never wait on a writer;
+#    LG_BUSY_TIMEOUT_MS only covers the brief locks of WAL recovery/reset.
+
+from __future__ import annotations
+
+import abc
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+POOL_SIZE    = int(os.environ.get("LG_POOL_SIZE", 8))
+POOL_TIMEOUT = float(os.environ.get("LG_POOL_TIMEOUT", 5.0))   # seconds to wait for a free connection
+MMAP_MB      = int(os.environ.get("LG_MMAP_MB", 256))
+CACHE_MB     = int(os.environ.get("LG_CACHE_MB", 64))           # per connection
+STMT_CACHE   = 256                                              # prepared statements per connection
+BUSY_TIMEOUT_MS = int(os.environ.get("LG_BUSY_TIMEOUT_MS", 5000))  # readers and writers alike
+
+# Bumped by materialize.rebuild_facets (every full rebuild goes through it)
+REBUILDS_SQL = "SELECT rebuilds FROM read_models_state WHERE id = 1"
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool timeout."""
+
+
+class ReadPool:
+    def __init__(self, path: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: List[Tuple[sqlite3.Connection, int]] = []   # LIFO keeps the warmest cache on top
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._data_version: Dict[int, int] = {}                 # id(conn) -> last PRAGMA data_version seen
+        # One extra connection, never handed out: lets a new connection tell whether
+        # anything committed since the pool last looked (data_version is per connection)
+        self._sentinel: Optional[sqlite3.Connection] = None
+        self._sentinel_at: Tuple[int, int] = (-1, 0)             # (generation, data_version)
+        self._sentinel_lock = threading.Lock()
+        self.generation = 0
+        # counters
+        self._open = 0
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._acquired = 0
+        self._waited = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._wait_total = 0.0
+        self._last_active = time.monotonic()
+
+    # --- connection setup ---
+
+    def _open_ro(self, **kwargs) -> sqlite3.Connection:
+        uri = f"file:{quote(os.path.abspath(self.path))}?mode=ro"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000, **kwargs)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = self._open_ro(cached_statements=STMT_CACHE)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = 1")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_MB * 1024 * 1024}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_MB * 1024}")   # negative = KiB
+        conn.execute("PRAGMA temp_store = MEMORY")
+        # Start data_changed() from here, unless something committed since the pool last
+        # looked: then the first check still reports it (a new connection alone can't tell)
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if not self._moved():
+            with self._lock:
+                self._data_version[id(conn)] = version
+        return conn
+
+    def _moved(self) -> bool:
+        """Did anything commit, or the file change, since the last call? Cheap: one PRAGMA."""
+        with self._sentinel_lock:
+            generation = self.generation
+            if self._sentinel is None or self._sentinel_at[0] != generation:
+                if self._sentinel is not None:
+                    self._sentinel.close()
+                self._sentinel = self._open_ro()
+                self._sentinel_at = (generation, self._sentinel.execute("PRAGMA data_version").fetchone()[0])
+                return True
+            version = self._sentinel.execute("PRAGMA data_version").fetchone()[0]
+            moved = version != self._sentinel_at[1]
+            self._sentinel_at = (generation, version)
+            return moved
+
+    def _file_identity(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_dev, st.st_ino)
+
+    def _check_file(self):
+        """Called under the lock: start a new generation when the file was swapped."""
+        ident = self._file_identity()
+        if ident == self._file_id:
+            return
+        if self._file_id is not None:
+            self.generation += 1
+            self._recycled += len(self._idle)
+            for conn, _ in self._idle:
+                self._close(conn)
+            self._idle.clear()
+        self._file_id = ident
+
+    def _close(self, conn: sqlite3.Connection):
+        """Called under the lock."""
+        self._data_version.pop(id(conn), None)
+        self._open -= 1
+        conn.close()
+
+    # --- checkout / checkin ---
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        t0 = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._timeouts += 1
+                raise PoolTimeout(f"no database connection free after {self.timeout:.1f}s")
+            with self._lock:
+                self._waited += 1
+                self._wait_total += time.monotonic() - t0
+
+        try:
+            conn, gen = self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        try:
+            yield conn
+        finally:
+            self._checkin(conn, gen)
+            self._slots.release()
+
+    def _checkout(self) -> Tuple[sqlite3.Connection, int]:
+        with self._lock:
+            self._check_file()
+            self._acquired += 1
+            if self._idle:
+                conn, gen = self._idle.pop()
+            else:
+                conn, gen = None, self.generation
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        if conn is None:
+            try:
+                conn = self._connect()
+            except BaseException:
+                with self._lock:
+                    self._in_use -= 1
+                raise
+            with self._lock:
+                self._open += 1
+        return conn, gen
+
+    def _checkin(self, conn: sqlite3.Connection, gen: int):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+            self._last_active = time.monotonic()
+            if gen == self.generation:
+                self._idle.append((conn, gen))
+                return
+            self._recycled += 1
+            self._close(conn)
+
+    # --- maintenance ---
+
+    def idle_seconds(self) -> float:
+        """How long no connection has been checked out (0 while any is in use)."""
+        with self._lock:
+            return 0.0 if self._in_use else time.monotonic() - self._last_active
+
+    def data_changed(self, conn: sqlite3.Connection) -> bool:
+        """
+        True if anyone committed since this connection last asked (or, for its
+        first call, since the pool last looked when it was opened). PRAGMA
+        data_version is per connection, so each one keeps its own baseline.
+        """
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            last = self._data_version.get(id(conn))
+            self._data_version[id(conn)] = version
+        return last != version
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "saturation": round(self._in_use / self.size, 3) if self.size else None,
+                "acquired": self._acquired,
+                "waited": self._waited,
+                "avg_wait_ms": round(1000 * self._wait_total / self._waited, 3) if self._waited else 0.0,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "generation": self.generation,
+            }
+
+
+class DataWatcher(abc.ABC):
+    """
+    In-memory view of the database kept fresh by polling PRAGMA data_version
+    on its own connection (so it never eats the API pool's change signals).
+    Subclasses implement reload(conn) and, optionally, a cheaper update(conn).
+    """
+
+    def __init__(self, path: str, poll: float):
+        self.poll = poll
+        self._pool = ReadPool(path, size=1)
+        self._generation = -1
+        self._rebuilds: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Load synchronously, then keep the view fresh from a daemon thread."""
+        self.refresh()
+        self._thread = threading.Thread(target=self._watch, name=f"lg-{type(self).__name__}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll):
+            try:
+                self.refresh()
+            except sqlite3.Error:
+                # Database mid-swap or locked; try again on the next tick
+                pass
+
+    def refresh(self):
+        """Bring the view up to date now (one PRAGMA when nothing changed)."""
+        with self._pool.connection() as conn:   # size 1: refreshes never overlap
+            changed = self._pool.data_changed(conn)
+            if self._pool.generation != self._generation:
+                self._generation = self._pool.generation
+                self._rebuilds = _rebuilds(conn)
+                self.reload(conn)
+            elif changed:
+                # A rebuild rewrites every card without moving updated_at; update() can't see it
+                rebuilds = _rebuilds(conn)
+                if rebuilds != self._rebuilds:
+                    self._rebuilds = rebuilds
+                    self.reload(conn)
+                else:
+                    self.update(conn)
+
+    @abc.abstractmethod
+    def reload(self, conn: sqlite3.Connection):
+        """Rebuild the whole view from `conn`."""
+
+    def update(self, conn: sqlite3.Connection):
+        self.reload(conn)
+
+
+def _rebuilds(conn: sqlite3.Connection) -> Optional[int]:
+    try:
+        row = conn.execute(REBUILDS_SQL).fetchone()
+    except sqlite3.OperationalError:
+        return None   # not migrated yet
+    return row[0] if row else None
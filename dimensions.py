@@ -0,0 +1,37 @@
+# backend/dimensions.py
+# Writer-side name -> id resolution for the developer / publisher / tag
+# dimensions (see migrations.py, step 5).
+#
+# Each table is read into a dict the first time a writer needs it; after that
+# known names cost a dict lookup and only new names touch the database. Ids
+# are never reused or deleted, so the cache stays valid for the whole run. A
+# writer that rolls back a transaction which minted ids should call clear().
+
+import sqlite3
+from typing import Dict, Optional
+
+
+class NameIds:
+    def __init__(self, table: str):
+        self.table = table
+        self._ids: Optional[Dict[str, int]] = None
+
+    def id(self, conn: sqlite3.Connection, name: str) -> int:
+        """Id for `name`, inserting it into the dimension table when new. Does not commit."""
+        if self._ids is None:
+            self._ids = {n: i for i, n in conn.execute(f"SELECT id, name FROM {self.table}")}
+        found = self._ids.get(name)
+        if found is None:
+            # Another process may have added it since the cache was loaded
+            row = conn.execute(f"SELECT id FROM {self.table} WHERE name = ?", (name,)).fetchone()
+            found = row[0] if row else conn.execute(f"INSERT INTO {self.table} (name) VALUES (?)", (name,)).lastrowid
+            self._ids[name] = found
+        return found
+
+    def clear(self):
+        self._ids = None
+
+
+DEVELOPERS = NameIds("developers")
+PUBLISHERS = NameIds("publishers")
+TAGS = NameIds("tags")
@@ -1,7 +1,11 @@
 import sqlite3, csv, argparse
 from io import StringIO
 
+from migrations import migrate_file
+
 def export(db, out, root=None):
+    # The query joins the developer/publisher/tag dimensions (migration 5)
+    migrate_file(db)
     conn = sqlite3.connect(db)
     conn.row_factory = sqlite3.Row
     cur = conn.cursor()
@@ -23,9 +27,9 @@ def export(db, out, root=None):
         return m
     genres_map = map_list("""SELECT gg.game_id, ge.name AS name FROM game_genres gg JOIN genres ge ON ge.id=gg.genre_id""")
     plats_map  = map_list("""SELECT gp.game_id, pf.name AS name FROM game_platforms gp JOIN platforms pf ON pf.id=gp.platform_id""")
-    devs_map   = map_list("""SELECT game_id, developer AS name FROM game_developers""")
-    pubs_map   = map_list("""SELECT game_id, publisher AS name FROM game_publishers""")
-    tags_map   = map_list("""SELECT game_id, tag AS name FROM game_tags""")
+    devs_map   = map_list("""SELECT gd.game_id, d.name AS name FROM game_developers gd JOIN developers d ON d.id=gd.developer_id""")
+    pubs_map   = map_list("""SELECT gp.game_id, p.name AS name FROM game_publishers gp JOIN publishers p ON p.id=gp.publisher_id""")
+    tags_map   = map_list("""SELECT gt.game_id, t.name AS name FROM game_tags gt JOIN tags t ON t.id=gt.tag_id""")
     series_map = map_list("""SELECT game_id, name, url FROM game_series_links""")
     adds_map   = map_list("""SELECT game_id, name, url FROM game_additions_links""")
     shots_map  = map_list("""SELECT game_id, url FROM screenshots""")
@@ -0,0 +1,226 @@
+# backend/facets.py
+# In-memory facet bitsets for /facets.
+#
+#  - game_facets (see materialize.py) is loaded into one Python int per facet
+#    value, bit i = i-th game. Counting a facet for any filter combination is
+#    an AND plus int.bit_count() per value; no GROUP BY at request time.
+#  - Each facet is counted with every filter except its own, so the sidebar
+#    shows what picking another genre / year / band would give.
+#  - Only the FACET_TAGS most common tags (facet_counts) are held and counted;
+#    a rarer tag used as a filter is read from game_facets' primary key.
+#  - Kept fresh by polling PRAGMA data_version (db_pool.DataWatcher): cards
+#    updated since the last load are patched in, deletions force a reload, and
+#    so does a full rebuild (materialize.rebuild_facets), which also re-ranks
+#    the held tags.
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from db_pool import DataWatcher
+
+FACET_TAGS  = int(os.environ.get("LG_FACET_TAGS", 50))
+FACET_POLL  = float(os.environ.get("LG_FACET_POLL", 1.0))
+METASCORE_BANDS = [(90, 100), (75, 89), (50, 74), (0, 49)]
+
+Key = Tuple[str, str]   # (facet, normalized value)
+
+
+def facet_key(facet: str, value: str) -> Key:
+    # genre/platform/tag filters match names case-insensitively, like /games
+    return (facet, value.casefold() if facet in ("genre", "platform", "tag") else value)
+
+
+class _Snapshot:
+    """Immutable once published."""
+
+    def __init__(self, position: Dict[int, int], bits: Dict[Key, int], labels: Dict[Key, str],
+                 tags: Tuple[str, ...], high_water: Optional[str]):
+        self.position = position        # game id -> bit
+        self.bits = bits
+        self.labels = labels            # key -> display value
+        self.tags = tags                # tags held in memory
+        self.tag_keys = {facet_key("tag", t) for t in tags}
+        self.high_water = high_water
+        self.all = (1 << len(position)) - 1
+        keys: Dict[str, List[Key]] = defaultdict(list)
+        for key in bits:
+            keys[key[0]].append(key)
+        self.keys = dict(keys)          # facet -> its value keys
+        self.bands = [
+            (lo, hi, _union(bits, [k for k in self.keys.get("metascore", []) if lo <= int(k[1]) <= hi]))
+            for lo, hi in METASCORE_BANDS
+        ]
+
+
+def _union(bits: Dict[Key, int], keys: List[Key]) -> int:
+    out = 0
+    for key in keys:
+        out |= bits[key]
+    return out
+
+
+def _bitsets(rows, position: Dict[int, int], n: int) -> Tuple[Dict[Key, int], Dict[Key, str]]:
+    """(facet, value, game_id) rows -> one int bitset per key (built in a bytearray, not by |=)."""
+    buffers: Dict[Key, bytearray] = {}
+    labels: Dict[Key, str] = {}
+    size = (n + 7) // 8
+    for facet, value, gid in rows:
+        pos = position.get(gid)
+        if pos is None:
+            continue
+        key = facet_key(facet, value)
+        buf = buffers.get(key)
+        if buf is None:
+            buf = buffers[key] = bytearray(size)
+            labels[key] = value
+        buf[pos >> 3] |= 1 << (pos & 7)
+    return {key: int.from_bytes(buf, "little") for key, buf in buffers.items()}, labels
+
+
+class FacetIndex(DataWatcher):
+    def __init__(self, path: str, poll: float = FACET_POLL):
+        super().__init__(path, poll)
+        self._snap: Optional[_Snapshot] = None
+        self.generation = 0   # bumped per published snapshot; part of the API cache keys that use it
+
+    def _publish(self, snap: _Snapshot):
+        self._snap = snap
+        self.generation += 1
+
+    # --- loading ---
+
+    def reload(self, conn: sqlite3.Connection):
+        try:
+            cards = conn.execute("SELECT id, updated_at FROM game_cards ORDER BY id").fetchall()
+            tags = tuple(r[0] for r in conn.execute(
+                "SELECT value FROM facet_counts WHERE facet = 'tag' ORDER BY games DESC, value LIMIT ?", (FACET_TAGS,)
+            ))
+            rows = conn.execute(
+                "SELECT facet, value, game_id FROM game_facets "
+                "WHERE facet NOT IN ('all', 'day') AND (facet <> 'tag' OR value IN (SELECT value FROM json_each(?)))",
+                (json.dumps(tags),),
+            )
+        except sqlite3.OperationalError:
+            # Rollups not built yet (materialize.py); count nothing
+            self._publish(_Snapshot({}, {}, {}, (), None))
+            return
+        position = {r[0]: i for i, r in enumerate(cards)}
+        bits, labels = _bitsets(rows, position, len(position))
+        high_water = max((r[1] for r in cards if r[1]), default=None)
+        self._publish(_Snapshot(position, bits, labels, tags, high_water))
+
+    def update(self, conn: sqlite3.Connection):
+        old = self._snap
+        if old is None or old.high_water is None:
+            return self.reload(conn)
+        changed = conn.execute("SELECT id, updated_at FROM game_cards WHERE updated_at >= ?", (old.high_water,)).fetchall()
+        position = dict(old.position)
+        for gid, _ in changed:
+            position.setdefault(gid, len(position))
+        if len(position) != conn.execute("SELECT COUNT(*) FROM game_cards").fetchone()[0]:
+            # Something was deleted; bits can't be renumbered in place
+            return self.reload(conn)
+
+        ids = [gid for gid, _ in changed]
+        mask = 0
+        for gid in ids:
+            mask |= 1 << position[gid]
+        bits = {key: b & ~mask if b & mask else b for key, b in old.bits.items()}
+        labels = dict(old.labels)
+        rows = conn.execute(
+            "SELECT facet, value, game_id FROM game_facets "
+            "WHERE game_id IN (SELECT value FROM json_each(?)) AND facet NOT IN ('all', 'day')",
+            (json.dumps(ids),),
+        ).fetchall()
+        for facet, value, gid in rows:
+            if facet == "tag" and value not in old.tags:
+                continue
+            key = facet_key(facet, value)
+            bits[key] = bits.get(key, 0) | (1 << position[gid])
+            labels.setdefault(key, value)
+        bits = {key: b for key, b in bits.items() if b}
+        high_water = max([old.high_water] + [u for _, u in changed if u])
+        self._publish(_Snapshot(position, bits, labels, old.tags, high_water))
+
+    # --- counting (request path) ---
+
+    def counts(self, conn: sqlite3.Connection, filters: Dict[str, object]) -> dict:
+        """Facet counts for the games matching `filters` (same keys as /games)."""
+        snap = self._snap or _Snapshot({}, {}, {}, (), None)
+        restrict = self._restrict(snap, conn, filters)
+
+        def base(excluding: Optional[str]) -> int:
+            b = snap.all
+            for facet, r in restrict.items():
+                if facet != excluding:
+                    b &= r
+            return b
+
+        def values(facet: str) -> List[dict]:
+            b = base(facet)
+            out = [{"value": snap.labels[k], "count": (b & snap.bits[k]).bit_count()} for k in snap.keys.get(facet, [])]
+            return [v for v in out if v["count"]]
+
+        meta = base("metascore")
+        by_count = lambda v: (-v["count"], v["value"].casefold())
+        return {
+            "total": base(None).bit_count(),
+            "facets": {
+                "genre": sorted(values("genre"), key=by_count),
+                "platform": sorted(values("platform"), key=by_count),
+                "tag": sorted(values("tag"), key=by_count),
+                "year": sorted(values("year"), key=lambda v: v["value"], reverse=True),
+                "metascore": [
+                    {"value": f"{lo}-{hi}", "min": lo, "count": (meta & band).bit_count()}
+                    for lo, hi, band in snap.bands
+                ],
+            },
+        }
+
+    def total(self, conn: sqlite3.Connection, filters: Dict[str, object]) -> Optional[int]:
+        """Number of games matching every filter (one AND per filter); None before the first load."""
+        snap = self._snap
+        if snap is None:
+            return None
+        b = snap.all
+        for r in self._restrict(snap, conn, filters).values():
+            b &= r
+        return b.bit_count()
+
+    def _restrict(self, snap: _Snapshot, conn: sqlite3.Connection, filters: Dict[str, object]) -> Dict[str, int]:
+        """facet -> bitset of the games its filter lets through."""
+        restrict: Dict[str, int] = {}
+        for facet in ("genre", "platform"):
+            if filters.get(facet) is not None:
+                restrict[facet] = snap.bits.get(facet_key(facet, filters[facet]), 0)
+        if filters.get("tag") is not None:
+            restrict["tag"] = self._tag_bits(snap, conn, filters["tag"])
+        if filters.get("year_from") is not None or filters.get("year_to") is not None:
+            lo, hi = filters.get("year_from") or 0, filters.get("year_to") or 9999
+            restrict["year"] = _union(snap.bits, [k for k in snap.keys.get("year", []) if lo <= int(k[1]) <= hi])
+        if filters.get("min_metascore") is not None:
+            restrict["metascore"] = _union(
+                snap.bits, [k for k in snap.keys.get("metascore", []) if int(k[1]) >= filters["min_metascore"]]
+            )
+        return restrict
+
+    def _tag_bits(self, snap: _Snapshot, conn: sqlite3.Connection, tag: str) -> int:
+        key = facet_key("tag", tag)
+        if key in snap.bits or key in snap.tag_keys:
+            return snap.bits.get(key, 0)
+        rows = conn.execute(
+            "SELECT facet, value, game_id FROM game_facets WHERE facet = 'tag' AND value = ? COLLATE NOCASE", (tag,)
+        )
+        bits, _ = _bitsets(rows, snap.position, len(snap.position))
+        return bits.get(key, 0)
+
+    def stats(self) -> dict:
+        snap = self._snap
+        if snap is None:
+            return {"games": 0, "values": 0}
+        return {"games": len(snap.position), "values": len(snap.bits), "tags": len(snap.tags)}
@@ -1,6 +1,11 @@
 import os, time, json, sqlite3, requests
 from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
+from dimensions import DEVELOPERS, PUBLISHERS, TAGS
+from materialize import refresh_game, touch_game
+from migrations import migrate
+import publish
+import wal
 
 # Load .env from this folder if present
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
@@ -36,8 +41,7 @@ def normalize_rawg_image(url: Optional[str]) -> Optional[str]:
     return "https://media.rawg.io/media/" + "/".join(parts)
 
 def ensure_db(conn: sqlite3.Connection):
-    from db_prepare import main as _prep
-    _prep()
+    migrate(conn)
 
 def upsert_game(conn, g):
     conn.execute("""INSERT OR IGNORE INTO games(id, slug, name, description, released, rating)
@@ -118,15 +122,15 @@ def enrich(conn, gid:int, listing:Dict[str,Any]):
     # developers
     for dev in (d.get("developers") or []):
         if dev.get("name"):
-            conn.execute("INSERT OR IGNORE INTO game_developers(game_id, developer) VALUES(?,?)", (gid, dev["name"]))
+            conn.execute("INSERT OR IGNORE INTO game_developers(game_id, developer_id) VALUES(?,?)", (gid, DEVELOPERS.id(conn, dev["name"])))
     # publishers
     for pub in (d.get("publishers") or []):
         if pub.get("name"):
-            conn.execute("INSERT OR IGNORE INTO game_publishers(game_id, publisher) VALUES(?,?)", (gid, pub["name"]))
+            conn.execute("INSERT OR IGNORE INTO game_publishers(game_id, publisher_id) VALUES(?,?)", (gid, PUBLISHERS.id(conn, pub["name"])))
     # tags
     for t in (d.get("tags") or []):
         if t.get("name"):
-            conn.execute("INSERT OR IGNORE INTO game_tags(game_id, tag) VALUES(?,?)", (gid, t["name"]))
+            conn.execute("INSERT OR IGNORE INTO game_tags(game_id, tag_id) VALUES(?,?)", (gid, TAGS.id(conn, t["name"])))
     # series & additions
     for item in fetch_series(gid):
         name, slug = item.get("name"), item.get("slug")
@@ -138,11 +142,10 @@ def enrich(conn, gid:int, listing:Dict[str,Any]):
             conn.execute("INSERT OR IGNORE INTO game_additions_links(game_id, name, url) VALUES(?,?,?)", (gid, name, f"https://rawg.io/games/{slug}"))
 
 def fetch_games():
-    conn = sqlite3.connect(DB)
+    conn = wal.connect(DB)
     conn.execute("PRAGMA foreign_keys=ON")
-    # ensure schema
-    from db_prepare import main as _prep
-    _prep()
+    # ensure schema (no-op when already at the latest migration)
+    ensure_db(conn)
 
     page = 1
     while True:
@@ -150,11 +153,15 @@ def fetch_games():
         if not data or not data.get("results"):
             break
         for g in data["results"]:
+            changes_before = conn.total_changes
             upsert_game(conn, g)
             gid = g["id"]
             # try‑harder before skipping
             if not complete_enough(conn, gid):
                 enrich(conn, gid, g)
+            if conn.total_changes != changes_before:
+                touch_game(conn, gid)
+            refresh_game(conn, gid)
             conn.commit()
         print(f"Committed page {page}")
         page += 1
@@ -162,6 +169,7 @@ def fetch_games():
         if os.environ.get("LG_FETCH_ALL") != "1":
             break
     conn.close()
+    publish.after_batch()
 
 if __name__ == "__main__":
     fetch_games()
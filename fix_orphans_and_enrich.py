@@ -23,6 +23,12 @@ import sys
 from dotenv import load_dotenv
 load_dotenv()
 
+from dimensions import DEVELOPERS, PUBLISHERS, TAGS
+from materialize import refresh_game, touch_game
+from migrations import migrate
+import publish
+import wal
+
 API_KEY = os.environ.get("RAWG_API_KEY", "").strip()
 DB      = os.environ.get("LG_DB", "latestgames.db").strip()
 ROOT    = Path(os.environ.get("LG_SHOTS_DIR", "screenshots")).resolve()
@@ -33,165 +39,22 @@ RETRY_429_SLEEP = 60
 # Soft quota for images (you can raise later)
 MAX_IMAGES = int(os.environ.get("LG_MAX_IMAGES", 50))
 
+# With LG_SERVE_DB set, publish a fresh API snapshot every this many games
+PUBLISH_EVERY = int(os.environ.get("LG_PUBLISH_EVERY", 50))
+
 if not API_KEY:
     raise SystemExit("RAWG_API_KEY missing. Add it to backend/.env or environment.")
 
 # --- SQLite helpers ---
 
 def get_conn():
-    conn = sqlite3.connect(DB)
+    conn = wal.connect(DB)
     conn.row_factory = sqlite3.Row
     return conn
 
 def ensure_schema(conn: sqlite3.Connection):
-    cur = conn.cursor()
-
-    # columns (safe if already exist)
-    cur.execute("PRAGMA table_info(games)")
-    cols = {r[1] for r in cur.fetchall()}  # (cid, name, ...)
-    add_cols = []
-    if "description" not in cols:       add_cols.append("ALTER TABLE games ADD COLUMN description TEXT")
-    if "website" not in cols:           add_cols.append("ALTER TABLE games ADD COLUMN website TEXT")
-    if "age_rating" not in cols:        add_cols.append("ALTER TABLE games ADD COLUMN age_rating TEXT")
-    if "cover_image" not in cols:       add_cols.append("ALTER TABLE games ADD COLUMN cover_image TEXT")
-    # NEW: metascore columns
-    if "metascore_number" not in cols:  add_cols.append("ALTER TABLE games ADD COLUMN metascore_number INTEGER")
-    if "metascore_color"  not in cols:  add_cols.append("ALTER TABLE games ADD COLUMN metascore_color TEXT")
-
-    for sql in add_cols:
-        cur.execute(sql)
-
-    # aux tables (idempotent)
-    cur.executescript("""
-    CREATE TABLE IF NOT EXISTS game_developers (
-        game_id INTEGER NOT NULL,
-        developer TEXT NOT NULL,
-        PRIMARY KEY (game_id, developer)
-    );
-    CREATE TABLE IF NOT EXISTS game_publishers (
-        game_id INTEGER NOT NULL,
-        publisher TEXT NOT NULL,
-        PRIMARY KEY (game_id, publisher)
-    );
-    CREATE TABLE IF NOT EXISTS game_tags (
-        game_id INTEGER NOT NULL,
-        tag TEXT NOT NULL,
-        PRIMARY KEY (game_id, tag)
-    );
-    CREATE TABLE IF NOT EXISTS game_series_links (
-        game_id INTEGER NOT NULL,
-        name TEXT NOT NULL,
-        url TEXT NOT NULL,
-        PRIMARY KEY (game_id, name, url)
-    );
-    CREATE TABLE IF NOT EXISTS game_additions_links (
-        game_id INTEGER NOT NULL,
-        name TEXT NOT NULL,
-        url TEXT NOT NULL,
-        PRIMARY KEY (game_id, name, url)
-    );
-    -- Legacy screenshots table retained for compatibility
-    CREATE TABLE IF NOT EXISTS screenshots (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        game_id INTEGER NOT NULL,
-        url TEXT NOT NULL
-    );
-    """)
-
-    # helpful indexes (safe)
-    cur.executescript("""
-    CREATE INDEX IF NOT EXISTS idx_games_slug ON games(slug);
-    CREATE INDEX IF NOT EXISTS idx_games_released ON games(released);
-    CREATE INDEX IF NOT EXISTS idx_dev_gid ON game_developers(game_id);
-    CREATE INDEX IF NOT EXISTS idx_pub_gid ON game_publishers(game_id);
-    CREATE INDEX IF NOT EXISTS idx_tag_gid ON game_tags(game_id);
-    CREATE INDEX IF NOT EXISTS idx_series_gid ON game_series_links(game_id);
-    CREATE INDEX IF NOT EXISTS idx_additions_gid ON game_additions_links(game_id);
-    CREATE INDEX IF NOT EXISTS idx_shots_gid ON screenshots(game_id);
-    """)
-
-    # Core lookup + link tables for genres/platforms (idempotent)
-    cur.executescript("""
-    CREATE TABLE IF NOT EXISTS genres (
-        id INTEGER PRIMARY KEY,
-        name TEXT UNIQUE
-    );
-    CREATE TABLE IF NOT EXISTS game_genres (
-        game_id INTEGER NOT NULL,
-        genre_id INTEGER NOT NULL,
-        PRIMARY KEY (game_id, genre_id)
-    );
-    CREATE TABLE IF NOT EXISTS platforms (
-        id INTEGER PRIMARY KEY,
-        name TEXT UNIQUE
-    );
-    CREATE TABLE IF NOT EXISTS game_platforms (
-        game_id INTEGER NOT NULL,
-        platform_id INTEGER NOT NULL,
-        PRIMARY KEY (game_id, platform_id)
-    );
-    CREATE INDEX IF NOT EXISTS idx_game_genres_gid ON game_genres(game_id);
-    CREATE INDEX IF NOT EXISTS idx_game_platforms_gid ON game_platforms(game_id);
-    """)
-
-    # NEW: normalized media table (images & videos)
-    cur.executescript("""
-    CREATE TABLE IF NOT EXISTS media (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        game_id INTEGER NOT NULL,
-        type TEXT NOT NULL CHECK(type IN ('image','video')),
-        url TEXT NOT NULL,
-        preview_url TEXT,
-        position INTEGER,
-        UNIQUE(game_id, type, url)
-    );
-    CREATE INDEX IF NOT EXISTS idx_media_gid ON media(game_id);
-    CREATE INDEX IF NOT EXISTS idx_media_gid_type ON media(game_id, type);
-    """)
-
-    # NEW: stores (where to buy) and link table
-    cur.executescript("""
-    CREATE TABLE IF NOT EXISTS stores (
-        id INTEGER PRIMARY KEY,
-        name TEXT,
-        slug TEXT,
-        domain TEXT,
-        logo_url TEXT,      -- optional, to be filled later
-        hover_image_url TEXT -- optional, to be filled later
-    );
-    CREATE UNIQUE INDEX IF NOT EXISTS idx_stores_slug ON stores(slug);
-
-    CREATE TABLE IF NOT EXISTS game_stores (
-        game_id INTEGER NOT NULL,
-        store_id INTEGER NOT NULL,
-        url TEXT,
-        PRIMARY KEY (game_id, store_id)
-    );
-    CREATE INDEX IF NOT EXISTS idx_game_stores_gid ON game_stores(game_id);
-    """)
-
-    conn.commit()
-
-    # NEW: suggestions tables (denormalized for quick display)
-    cur.executescript("""
-    CREATE TABLE IF NOT EXISTS game_suggestions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        game_id INTEGER NOT NULL,           -- source game
-        position INTEGER NOT NULL,          -- 1..8 as seen on RAWG page
-        suggested_id INTEGER,               -- RAWG id if present
-        name TEXT,
-        image_url TEXT,
-        platforms_csv TEXT,                 -- e.g., "PC; PlayStation 4"
-        metascore_number INTEGER,
-        metascore_color TEXT,
-        released TEXT,                      -- YYYY-MM-DD
-        genres_csv TEXT,
-        UNIQUE(game_id, position)
-    );
-    CREATE INDEX IF NOT EXISTS idx_suggestions_gid ON game_suggestions(game_id);
-    """)
-
-    conn.commit()
+    # Tables, indexes and read models are versioned in migrations.py
+    migrate(conn)
 
 # --- RAWG helpers ---
 
@@ -328,6 +191,16 @@ def metascore_color(score: Optional[int]) -> Optional[str]:
 
 # --- DB ops ---
 
+# Enrichable columns compared by upsert_game_core
+CORE_COLUMNS = ("description, website, age_rating, cover_image, released, rating, "
+                "slug, name, metascore_number, metascore_color")
+
+def _touch_if_changed(conn: sqlite3.Connection, gid: int, changes_before: int):
+    """Bump games.updated_at if anything was written since `changes_before` (conn.total_changes)."""
+    if conn.total_changes != changes_before:
+        touch_game(conn, gid)
+
+
 def upsert_game_core(conn: sqlite3.Connection, details: Dict[str, Any]):
     gid = details["id"]
     slug = details.get("slug") or str(gid)
@@ -340,6 +213,9 @@ def upsert_game_core(conn: sqlite3.Connection, details: Dict[str, Any]):
     mcolor = metascore_color(mscore)
 
     cur = conn.cursor()
+    # snapshot so updated_at only moves when something actually changed
+    before = cur.execute(f"SELECT {CORE_COLUMNS} FROM games WHERE id = ?", (gid,)).fetchone()
+
     # insert core (ignore if exists)
     cur.execute(
         """
@@ -374,10 +250,14 @@ def upsert_game_core(conn: sqlite3.Connection, details: Dict[str, Any]):
         """,
         (about, website, age, cover, released, rating, slug, name, mscore, mcolor, gid)
     )
+    after = cur.execute(f"SELECT {CORE_COLUMNS} FROM games WHERE id = ?", (gid,)).fetchone()
+    if before is None or tuple(before) != tuple(after):
+        touch_game(conn, gid)
     conn.commit()
 
 
 def upsert_lists(conn: sqlite3.Connection, gid: int, details: Dict[str, Any]):
+    changes_before = conn.total_changes
     cur = conn.cursor()
     devs = [d.get("name") for d in (details.get("developers") or []) if d.get("name")]
     pubs = [p.get("name") for p in (details.get("publishers") or []) if p.get("name")]
@@ -385,23 +265,25 @@ def upsert_lists(conn: sqlite3.Connection, gid: int, details: Dict[str, Any]):
 
     if devs:
         cur.executemany(
-            "INSERT OR IGNORE INTO game_developers (game_id, developer) VALUES (?, ?)",
-            [(gid, d.strip()) for d in devs]
+            "INSERT OR IGNORE INTO game_developers (game_id, developer_id) VALUES (?, ?)",
+            [(gid, DEVELOPERS.id(conn, d.strip())) for d in devs]
         )
     if pubs:
         cur.executemany(
-            "INSERT OR IGNORE INTO game_publishers (game_id, publisher) VALUES (?, ?)",
-            [(gid, p.strip()) for p in pubs]
+            "INSERT OR IGNORE INTO game_publishers (game_id, publisher_id) VALUES (?, ?)",
+            [(gid, PUBLISHERS.id(conn, p.strip())) for p in pubs]
         )
     if tags:
         cur.executemany(
-            "INSERT OR IGNORE INTO game_tags (game_id, tag) VALUES (?, ?)",
-            [(gid, t.strip()) for t in tags]
+            "INSERT OR IGNORE INTO game_tags (game_id, tag_id) VALUES (?, ?)",
+            [(gid, TAGS.id(conn, t.strip())) for t in tags]
         )
+    _touch_if_changed(conn, gid, changes_before)
     conn.commit()
 
 
 def upsert_genres_platforms(conn: sqlite3.Connection, gid: int, details: Dict[str, Any]):
+    changes_before = conn.total_changes
     cur = conn.cursor()
 
     # Genres appear as [{"id": 51, "name": "Indie"}, ...]
@@ -421,11 +303,13 @@ def upsert_genres_platforms(conn: sqlite3.Connection, gid: int, details: Dict[st
             cur.execute("INSERT OR IGNORE INTO platforms (id, name) VALUES (?, ?)", (int(pid_raw), pname.strip()))
             cur.execute("INSERT OR IGNORE INTO game_platforms (game_id, platform_id) VALUES (?, ?)", (gid, int(pid_raw)))
 
+    _touch_if_changed(conn, gid, changes_before)
     conn.commit()
 
 
 def upsert_store_links(conn: sqlite3.Connection, gid: int, details: Dict[str, Any]):
     """Upsert RAWG 'where to buy' store links from game details."""
+    changes_before = conn.total_changes
     cur = conn.cursor()
     stores = details.get("stores") or []
     rows_link = []
@@ -448,10 +332,12 @@ def upsert_store_links(conn: sqlite3.Connection, gid: int, details: Dict[str, An
             "INSERT OR IGNORE INTO game_stores (game_id, store_id, url) VALUES (?, ?, ?)",
             rows_link
         )
+    _touch_if_changed(conn, gid, changes_before)
     conn.commit()
 
 
 def upsert_links(conn: sqlite3.Connection, gid: int):
+    changes_before = conn.total_changes
     cur = conn.cursor()
     # series
     try:
@@ -487,6 +373,7 @@ def upsert_links(conn: sqlite3.Connection, gid: int):
     except Exception:
         pass
 
+    _touch_if_changed(conn, gid, changes_before)
     conn.commit()
 
 # --- Media storage ---
@@ -532,12 +419,14 @@ def cover_fallback_from_images(conn: sqlite3.Connection, gid: int, images: List[
         return
     if images:
         cur.execute("UPDATE games SET cover_image = ? WHERE id = ?", (images[0]["image"], gid))
+        touch_game(conn, gid)
         conn.commit()
 
 
 def store_media_images(conn: sqlite3.Connection, gid: int, images: List[Dict[str, Any]]):
     if not images:
         return
+    changes_before = conn.total_changes
     cur = conn.cursor()
     pos = 1
     rows_media = []
@@ -560,6 +449,7 @@ def store_media_images(conn: sqlite3.Connection, gid: int, images: List[Dict[str
     cur.execute("SELECT 1 FROM screenshots WHERE game_id = ? LIMIT 1", (gid,))
     if cur.fetchone() is None and rows_legacy:
         cur.executemany("INSERT INTO screenshots (game_id, url) VALUES (?, ?)", rows_legacy)
+    _touch_if_changed(conn, gid, changes_before)
     conn.commit()
 
     # NEW: also download images to disk under screenshots/<game_id>/
@@ -573,6 +463,7 @@ def store_media_images(conn: sqlite3.Connection, gid: int, images: List[Dict[str
 def store_media_videos(conn: sqlite3.Connection, gid: int, videos: List[Dict[str, Any]]):
     if not videos:
         return
+    changes_before = conn.total_changes
     cur = conn.cursor()
     rows = []
     pos = 1
@@ -587,6 +478,7 @@ def store_media_videos(conn: sqlite3.Connection, gid: int, videos: List[Dict[str
             "INSERT OR IGNORE INTO media (game_id, type, url, preview_url, position) VALUES (?, ?, ?, ?, ?)",
             rows
         )
+        _touch_if_changed(conn, gid, changes_before)
         conn.commit()
 
 # --- Enrichment controller ---
@@ -594,6 +486,7 @@ def store_media_videos(conn: sqlite3.Connection, gid: int, videos: List[Dict[str
 def store_suggestions(conn: sqlite3.Connection, gid: int, suggestions: List[Dict[str, Any]]):
     if not suggestions:
         return
+    changes_before = conn.total_changes
     cur = conn.cursor()
     rows = []
     pos = 1
@@ -622,6 +515,7 @@ def store_suggestions(conn: sqlite3.Connection, gid: int, suggestions: List[Dict
         """,
         rows
     )
+    _touch_if_changed(conn, gid, changes_before)
     conn.commit()
 
 # --- Enrichment controller ---
@@ -708,6 +602,10 @@ def enrich_one(conn: sqlite3.Connection, gid: int) -> bool:
         # Endpoint can be unavailable for non-business tiers; skip gracefully
         pass
 
+    # Keep the /games card row in step with everything written above
+    refresh_game(conn, gid)
+    conn.commit()
+
     return True
 
 # --- Utility: find IDs from folders ---
@@ -730,6 +628,12 @@ def ids_in_db(conn: sqlite3.Connection) -> set:
 
 # --- Main ---
 
+def batch_done(done: int):
+    """enrich_one commits per game; publish once every PUBLISH_EVERY of them."""
+    if done % PUBLISH_EVERY == 0:
+        publish.after_batch()
+
+
 def main():
     # Single-ID (or list) mode: python fix_orphans_and_enrich.py 27 123,456
     if len(sys.argv) > 1:
@@ -745,7 +649,7 @@ def main():
             conn.close()
             return
         print(f"Single-ID mode for IDs: {ids}")
-        for gid in ids:
+        for done, gid in enumerate(ids, 1):
             ok = enrich_one(conn, gid)
             if ok:
                 row = conn.execute(
@@ -758,8 +662,11 @@ def main():
                 )
             else:
                 print(f"[{gid}] RAWG details not found or request failed.")
+            batch_done(done)
             time.sleep(0.2)
         conn.close()
+        if len(ids) % PUBLISH_EVERY:
+            publish.after_batch()
         return
 
     print(f"DB: {DB}")
@@ -776,6 +683,7 @@ def main():
     print(f"Found {len(folder_ids)} folders, {len(db_ids)} rows in DB.")
     print(f"Need to INSERT {len(to_insert)} missing games (by ID from folder names).")
 
+    done = 0
     ins_ok = ins_fail = 0
     for gid in to_insert:
         ok = enrich_one(conn, gid)
@@ -783,6 +691,8 @@ def main():
             ins_ok += 1
         else:
             ins_fail += 1
+        done += 1
+        batch_done(done)
         time.sleep(0.2)
 
     # Now enrich ALL rows that still need data
@@ -798,6 +708,8 @@ def main():
                 en_ok += 1
             else:
                 en_skip += 1
+            done += 1
+            batch_done(done)
             time.sleep(0.2)
     conn.close()
 
@@ -805,6 +717,8 @@ def main():
     print(f"Inserted from folders: ok={ins_ok} failed={ins_fail}")
     print(f"Enriched existing rows: ok={en_ok} skipped/failed={en_skip}")
     print("Done.")
+    if done % PUBLISH_EVERY:
+        publish.after_batch()
 
 if __name__ == "__main__":
     main()
@@ -1,394 +1,846 @@
 # backend/games_api.py
 from __future__ import annotations
 
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
 import sqlite3
-from typing import Any, Dict, List, Optional
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from autocomplete import AUTOCOMPLETE_MAX, NameIndex
+from changes import CHANGES_SQL, HEAD_SQL, PRUNED_SQL
+from db_pool import ReadPool
+from facets import FacetIndex
+from materialize import CARD_FIELDS, NO_DATE, card_projection, detail_fields, detail_select
+from response_cache import ENCODINGS, CachedResponse, ResponseCache, negotiate
+from schema_registry import SchemaCapabilities, SchemaRegistry
+from wal import Checkpointer
 
 router = APIRouter()
 
-DB_PATH = "latestgames.db"
+# The published snapshot when publishing is on (publish.py), else the writers' file itself
+DB_PATH = os.environ.get("LG_SERVE_DB") or os.environ.get("LG_DB", "latestgames.db")
+BATCH_MAX = int(os.environ.get("LG_BATCH_MAX", 50))
+# A link filter (genre/platform/tag) matching fewer games than this drives the
+# query (join + sort of its matches); broader ones are probed while walking the sort key index
+FILTER_DRIVE_ROWS = int(os.environ.get("LG_FILTER_DRIVE_ROWS", 5000))
+SEARCH_MAX = 100   # results per /search page
+PAGE_MAX = int(os.environ.get("LG_PAGE_MAX", 200))   # cards per /games page
+CHANGES_MAX = 1000  # change log rows per /changes page
+STREAM_CHUNK = int(os.environ.get("LG_STREAM_CHUNK", 500))   # cards per pooled read in /games/stream
+
+# /games?order= -> game_cards sort key column (see materialize.SORT_KEYS_SQL), each indexed
+ORDERS = {
+    "top": "sort_top",
+    "new": "sort_new",
+    "rating": "sort_rating",
+    "name": "sort_name",
+    "upcoming": "sort_upcoming",
+}
+
+# Read-only, pre-tuned connections shared by all requests in this worker
+_pool = ReadPool(DB_PATH)
+
+# Rendered list pages / detail documents, dropped whenever the data changes
+_cache = ResponseCache()
+
+# Typeahead over game names/slugs and facet bitsets, held in memory (started by main.py)
+names = NameIndex(DB_PATH)
+facet_index = FacetIndex(DB_PATH)
+
+# Folds writer WAL frames back into the file: passive under traffic, truncate when idle (started by main.py)
+checkpointer = Checkpointer(DB_PATH, _pool)
 
 
 # ---------- Utilities ----------
 
-def _connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+def _encode_cursor(sort_key: str) -> str:
+    # sort_key already carries the full sort tuple plus id (see materialize.SORT_TOP_SQL)
+    return base64.urlsafe_b64encode(sort_key.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _fts_query(q: str) -> Optional[str]:
+    """
+    User text -> FTS5 query: every word must match, each as a prefix. Words are
+    quoted, so FTS5 syntax (AND/OR/NEAR, column filters, quotes) in q is inert.
+    """
+    words = re.findall(r"\w+", q)
+    return " ".join(f'"{w}"*' for w in words) if words else None
+
+
+# ---------- Statements (built once per schema version) ----------
+
+def _build_statements(caps: SchemaCapabilities) -> Dict[str, Optional[str]]:
+    """
+    Final SQL for every endpoint, chosen from what the schema actually has.
+    A None entry means the feature's tables/columns are absent and the endpoint
+    returns its empty value without querying.
+    """
+    sql: Dict[str, Optional[str]] = {}
+
+    if caps.has("game_cards", "sort_top", "updated_at", "card_json"):
+        # Pre-rendered card JSON (materialize.py); the page is just those blobs joined
+        sql["games_page"] = _page_sql("c.card_json", after=False)
+        sql["games_page_after"] = _page_sql("c.card_json", after=True)
+    else:
+        sql["games_page"] = sql["games_page_after"] = None
+    # /games totals from the facet_counts rollup (materialize.py keeps it current)
+    if caps.has("facet_counts", "facet", "value", "games"):
+        sql["count_value"] = "SELECT COALESCE(SUM(games), 0) FROM facet_counts WHERE facet = ? AND value = ?"
+        sql["count_name"] = ("SELECT COALESCE(SUM(games), 0) FROM facet_counts "
+                             "WHERE facet = ? AND value = ? COLLATE NOCASE")
+        sql["count_years"] = ("SELECT COALESCE(SUM(games), 0) FROM facet_counts "
+                              "WHERE facet = 'year' AND value >= ? AND value <= ?")
+        # Dated games released up to / after a 'YYYY-MM-DD' day (the new / upcoming feeds)
+        sql["count_new"] = ("SELECT COALESCE(SUM(games), 0) FROM facet_counts "
+                            "WHERE facet = 'day' AND value <= ?")
+        sql["count_upcoming"] = ("SELECT COALESCE(SUM(games), 0) FROM facet_counts "
+                                 "WHERE facet = 'day' AND value > ?")
+    else:
+        sql["count_value"] = sql["count_name"] = sql["count_years"] = None
+        sql["count_new"] = sql["count_upcoming"] = None
+    # Orders whose sort key column exists (cards built before it get it on the next rebuild)
+    for order, column in ORDERS.items():
+        sql[f"order_{order}"] = column if caps.has("game_cards", column) else None
+    # Range filters that can drive a page: the index name (for INDEXED BY), or None
+    for name, index in RANGE_INDEXES.items():
+        sql[f"drive_{name}"] = index if caps.has_index(index) else None
+
+    # Link filters: predicate on the link table selecting the rows for one value
+    # (served by the reverse indexes from materialize.FILTER_INDEXES)
+    sql["filter_genre"] = (
+        "genre_id IN (SELECT id FROM genres WHERE name = ? COLLATE NOCASE)"
+        if caps.has("game_genres", "genre_id") and caps.has("genres", "name") else None
+    )
+    sql["filter_platform"] = (
+        "platform_id IN (SELECT id FROM platforms WHERE name = ? COLLATE NOCASE)"
+        if caps.has("game_platforms", "platform_id") and caps.has("platforms", "name") else None
+    )
+    if caps.has("game_tags", "tag"):
+        sql["filter_tag"] = "tag = ? COLLATE NOCASE"
+    elif caps.has("game_tags", "tag_id") and caps.has("tags", "name"):
+        # Case-insensitive like genre/platform (served by idx_tags_name_nocase)
+        sql["filter_tag"] = "tag_id IN (SELECT id FROM tags WHERE name = ? COLLATE NOCASE)"
+    else:
+        sql["filter_tag"] = None
+
+    sql["game_detail_blob"] = """
+        SELECT detail_json, updated_at FROM game_details WHERE slug = ? LIMIT 1;
+    """ if caps.has("game_details", "slug", "detail_json", "updated_at") else None
+
+    # Live render for games whose blob hasn't been written yet
+    live = detail_select(caps)
+    sql["game_detail"] = f"{live} WHERE c.slug = ? LIMIT 1;" if live else None
+
+    # Batch lookups: the key list is bound as one JSON array, so a single prepared
+    # statement serves any batch size (no per-request SQL formatting)
+    for by in ("slug", "id"):
+        # Document first, key column by name (the live render also returns c.id / c.slug)
+        keys = "(SELECT value FROM json_each(?))"
+        sql[f"batch_card_{by}"] = f"""
+            SELECT card_json, {by} FROM game_cards WHERE {by} IN {keys};
+        """ if caps.has("game_cards", "card_json") else None
+        sql[f"batch_detail_blob_{by}"] = f"""
+            SELECT detail_json, {by} FROM game_details WHERE {by} IN {keys};
+        """ if caps.has("game_details", "slug", "detail_json") else None
+        sql[f"batch_detail_{by}"] = f"{live} WHERE c.{by} IN {keys};" if live else None
+
+    # Catalog export: id-ordered keyset chunks over the primary key
+    if caps.has("game_cards", "card_json", "updated_at"):
+        sql["stream"] = "SELECT id, card_json FROM game_cards WHERE id > ? ORDER BY id LIMIT ?;"
+        sql["stream_since"] = ("SELECT id, card_json FROM game_cards WHERE id > ? AND updated_at >= ? "
+                               "ORDER BY id LIMIT ?;")
+    else:
+        sql["stream"] = sql["stream_since"] = None
+
+    # Change log (changes.py): rows after a watermark, and how far back it still reaches
+    if caps.has("game_changes") and caps.has("game_changes_state"):
+        sql["changes"], sql["changes_head"], sql["changes_pruned"] = CHANGES_SQL, HEAD_SQL, PRUNED_SQL
+    else:
+        sql["changes"] = sql["changes_head"] = sql["changes_pruned"] = None
+
+    # Full-text search (materialize.FTS_SCHEMA): bm25 weights name > tags > developers > description
+    sql["search"] = """
+        SELECT
+            json_set(c.card_json, '$.snippet',
+                     snippet(games_fts, -1, '<mark>', '</mark>', '…', 12)) AS card_json
+        FROM games_fts
+        JOIN game_cards c ON c.id = games_fts.rowid
+        WHERE games_fts MATCH ?
+        ORDER BY bm25(games_fts, 10.0, 1.0, 4.0, 2.0), c.sort_top
+        LIMIT ? OFFSET ?;
+    """ if caps.has("games_fts") and caps.has("game_cards", "card_json", "sort_top") else None
+
+    return sql
+
+
+LINK_TABLES = {"genre": "game_genres", "platform": "game_platforms", "tag": "game_tags"}
+# Range filters -> game_cards index (migrations.RANGE_INDEXES)
+RANGE_INDEXES = {"year": "idx_game_cards_released", "metascore": "idx_game_cards_metascore"}
+
+def _page_sql(card: str, after: bool) -> str:
+    """One unfiltered /games page in the default order (memoized per schema version)."""
+    return f"""
+        SELECT {card} AS card_json, c.sort_top AS sort_key
+        FROM game_cards c
+        {"WHERE c.sort_top > ?" if after else ""}
+        ORDER BY c.sort_top
+        LIMIT ? OFFSET ?;
+    """
+
+
+_schema = SchemaRegistry(_build_statements)
+
+def _caps(conn: sqlite3.Connection) -> SchemaCapabilities:
+    return _schema.get(conn, _pool.generation)
+
+def _statements(conn: sqlite3.Connection) -> Dict[str, Optional[str]]:
+    return _caps(conn).sql
+
+# Called with the checked-out connection, and with None before it goes back to the
+# pool (lets the async router interrupt slow queries, and only its own)
+OnConnection = Optional[Callable[[Optional[sqlite3.Connection]], None]]
 
-def _split_csv(csv: Optional[str]) -> List[str]:
-    if not csv:
-        return []
-    # GROUP_CONCAT without custom separator uses ","; strip whitespace just in case
-    return [s.strip() for s in csv.split(",") if s.strip()]
+@contextmanager
+def _reader(on_connection: OnConnection = None) -> Iterator[sqlite3.Connection]:
+    """Pooled connection, after making sure the response cache isn't stale."""
+    with _pool.connection() as conn:
+        if on_connection:
+            on_connection(conn)
+        try:
+            if _pool.data_changed(conn):
+                # Something committed (enrichment run, new file): drop every rendered response
+                _cache.invalidate()
+            yield conn
+        finally:
+            if on_connection:
+                on_connection(None)
+
+def _rendered(body: bytes, headers: Dict[str, str], updated_at: Optional[str]) -> CachedResponse:
+    """Attach validators: a strong content-hash ETag and Last-Modified from updated_at."""
+    headers["ETag"] = '"%s"' % hashlib.sha1(body).hexdigest()
+    if updated_at:
+        ts = datetime.strptime(updated_at, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(ts, usegmt=True)
+    return CachedResponse(body, headers)
+
+def _variant_etag(etag: str, encoding: str) -> str:
+    # Each Content-Encoding is its own representation, so it gets its own strong tag
+    return f'{etag[:-1]}-{encoding}"'
+
+def _not_modified(request: Request, entry: CachedResponse) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+        tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+        etag = entry.headers["ETag"]
+        # Any variant's tag validates: they all carry the same document
+        return "*" in tags or etag in tags or any(_variant_etag(etag, enc) in tags for enc in entry.encoded)
+    ims = request.headers.get("if-modified-since")
+    last_modified = entry.headers.get("Last-Modified")
+    if ims and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _cached_response(request: Request, key: Hashable, render: Callable[[sqlite3.Connection], CachedResponse],
+                     on_connection: OnConnection = None) -> Response:
+    with _reader(on_connection) as conn:
+        entry = _cache.get(key)
+        if entry is None:
+            epoch = _cache.epoch
+            entry = render(conn)
+        else:
+            epoch = None
+    # Compression runs here, after the connection went back to the pool: all variants for
+    # an entry the cache keeps, only the client's choice for one it won't (too big)
+    accept = request.headers.get("accept-encoding")
+    if epoch is not None and not _cache.put(key, entry, epoch):
+        wanted = negotiate(accept, ENCODINGS)
+        if wanted:
+            entry.compress((wanted,))
+    encoding = negotiate(accept, entry.encoded)
+    headers = {**entry.headers, "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["ETag"] = _variant_etag(headers["ETag"], encoding)
+        headers["Content-Encoding"] = encoding
+    if _not_modified(request, entry):
+        # Revalidation hit: no body, nothing serialized
+        return Response(status_code=304, headers=headers)
+    body = entry.encoded[encoding] if encoding else entry.body
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def warm_up():
+    """Load schema capabilities at startup so the first request doesn't pay for it."""
+    try:
+        with _pool.connection() as conn:
+            _statements(conn)
+    except sqlite3.OperationalError:
+        # Database not there yet; the first request will retry
+        pass
+
+
+def game_filters(
+    genre: Optional[str] = None,
+    platform: Optional[str] = None,
+    tag: Optional[str] = None,
+    year_from: Optional[int] = Query(None, ge=0, le=9999),
+    year_to: Optional[int] = Query(None, ge=0, le=9999),
+    min_metascore: Optional[int] = Query(None, ge=0, le=100),
+) -> Dict[str, object]:
+    """Filter query parameters shared by /games and /facets."""
+    return {
+        "genre": genre, "platform": platform, "tag": tag,
+        "year_from": year_from, "year_to": year_to, "min_metascore": min_metascore,
+    }
+
+
+def _fields(fields: Optional[str], allowed: Optional[List[str]] = None) -> Optional[tuple]:
+    """?fields=a,b -> sorted tuple of field names (None = full document); 400 on unknown names."""
+    if fields is None:
+        return None
+    names = tuple(sorted({f.strip() for f in fields.split(",") if f.strip()}))
+    unknown = [f for f in names if allowed is not None and f not in allowed]
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}; allowed: {', '.join(allowed or [])}")
+    return names
+
+
+def _active(filters: Optional[Dict[str, object]]) -> tuple:
+    """Filters that are set, in a stable order (cache key)."""
+    return tuple(sorted((k, v) for k, v in (filters or {}).items() if v is not None))
 
 
 # ---------- Public Endpoints ----------
 @router.get("/games")
-def get_games(limit: int = 60, offset: int = 0) -> list[dict]:
+def get_games(
+    request: Request,
+    limit: int = Query(60, ge=1, le=PAGE_MAX),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    order: str = "top",
+    filters: Dict[str, object] = Depends(game_filters),
+) -> Response:
     """
     Returns a page of games for the /games index.
     - Never 404s; returns [] when there are no rows.
     - Preserves the card shape your frontend already uses.
-    - Safe if some tables (screenshots, genres, platforms) don't exist yet.
+    - Reads the denormalized game_cards table (see materialize.py); no aggregation per request.
+    - Keyset pagination: pass the X-Next-Cursor header of the previous page as `cursor`
+      (offset is ignored then). Plain limit/offset keeps working for old clients.
+    - X-Has-More: true|false (one extra row is fetched), X-Total-Count: games matching the
+      filters, from the maintained facet counts. new/upcoming only have it without filters
+      (the per-day rollup split at today).
+    - Served from the in-process response cache when the page was rendered since the last commit.
+    - Strong ETag; If-None-Match revalidations get a bare 304. No Last-Modified: a page also
+      changes when games join or leave it (or the day moves new/upcoming), which no row's
+      updated_at records.
+    - Optional filters: genre / platform / tag (name, case-insensitive), released year range
+      (year_from..year_to, inclusive) and min_metascore. Same order and cursors as unfiltered.
+    - `fields=id,slug,name,screenshot` returns only those card keys, selected straight from
+      game_cards columns instead of the stored card JSON.
+    - `order`: top (metascore, rating, name; default), new (released up to today, newest
+      first), rating, name, upcoming (released after today, soonest first). Each order walks
+      its own index; cursors belong to the order they came from.
     """
-    conn = _connect()
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
+    return games_page_response(request, limit, offset, cursor, filters, fields, order)
 
-    # Build aggregates defensively
-    def table_exists(name: str) -> bool:
-        try:
-            cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;", (name,))
-            return bool(cur.fetchone())
-        except sqlite3.OperationalError:
-            return False
 
-    has_screens = table_exists("screenshots")
-    has_ggenres  = table_exists("game_genres") and table_exists("genres")
-    has_gplat    = table_exists("game_platforms") and table_exists("platforms")
-
-    # CTEs guarded by flags
-    cte_parts = []
-    if has_ggenres:
-        cte_parts.append("""
-            genres_agg AS (
-              SELECT gg.game_id, GROUP_CONCAT(DISTINCT g.name) AS genres_csv
-              FROM game_genres gg
-              JOIN genres g ON g.id = gg.genre_id
-              GROUP BY gg.game_id
-            )
-        """)
-    if has_gplat:
-        cte_parts.append("""
-            platforms_agg AS (
-              SELECT gp.game_id, GROUP_CONCAT(DISTINCT p.name) AS platforms_csv
-              FROM game_platforms gp
-              JOIN platforms p ON p.id = gp.platform_id
-              GROUP BY gp.game_id
-            )
-        """)
-    if has_screens:
-        cte_parts.append("""
-            first_shot AS (
-              SELECT s.game_id, MIN(s.id) AS first_id
-              FROM screenshots s
-              GROUP BY s.game_id
-            )
-        """)
-
-    with_clause = ("WITH " + ",\n".join(cte_parts)) if cte_parts else ""
-
-    # SELECT with LEFT JOINs that are present; skip absent ones
-    select_sql = f"""
-        {with_clause}
-        SELECT
-          games.id,
-          games.slug,
-          games.name,
-          games.released,
-          games.rating,
-          games.metascore_number,
-          games.metascore_color,
-          /* cover/thumbnail fallback logic */
-          COALESCE(
-             {"ss.url," if has_screens else ""}
-             games.cover_image
-          ) AS screenshot,
-          games.cover_image
-          {" , ga.genres_csv"     if has_ggenres else ""}
-          {" , pa.platforms_csv"  if has_gplat   else ""}
-        FROM games
-        {" LEFT JOIN genres_agg ga ON ga.game_id = games.id" if has_ggenres else ""}
-        {" LEFT JOIN platforms_agg pa ON pa.game_id = games.id" if has_gplat else ""}
-        {" LEFT JOIN first_shot fs ON fs.game_id = games.id" if has_screens else ""}
-        {" LEFT JOIN screenshots ss ON ss.id = fs.first_id" if has_screens else ""}
-        ORDER BY COALESCE(games.metascore_number, 0) DESC, games.rating DESC, games.name COLLATE NOCASE ASC
+CARD_FIELD_NAMES = [key for key, _ in CARD_FIELDS]
+
+
+def games_page_response(request: Request, limit: int, offset: int, cursor: Optional[str],
+                        filters: Optional[Dict[str, object]] = None, fields: Optional[str] = None,
+                        order: str = "top", on_connection: OnConnection = None) -> Response:
+    """Blocking body of GET /games, shared by the sync and async routers."""
+    if order not in ORDERS:
+        raise HTTPException(status_code=400, detail=f"Unknown order; allowed: {', '.join(ORDERS)}")
+    after = _decode_cursor(cursor) if cursor else None
+    active = _active(filters)
+    projection = _fields(fields, CARD_FIELD_NAMES)
+    # new/upcoming split at today's date, so their pages are only good for the day
+    today = _today() if order in ("new", "upcoming") else None
+    # Multi-filter totals come from the facet bitsets: a page cached before they caught up
+    # with a commit must not outlive them
+    key = ("games", limit, offset if after is None else 0, after, active, projection, order, today,
+           facet_index.generation)
+    return _cached_response(
+        request, key,
+        lambda conn: _render_games_page(conn, limit, offset, after, dict(active), projection, order, today),
+        on_connection,
+    )
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%d")
+
+
+def _render_games_page(conn: sqlite3.Connection, limit: int, offset: int, after: Optional[str],
+                       filters: Dict[str, object], projection: Optional[tuple] = None,
+                       order: str = "top", today: Optional[str] = None) -> CachedResponse:
+    caps = _caps(conn)
+    sql = caps.sql
+    if after is not None:
+        offset = 0
+    card = card_projection(projection) if projection else "c.card_json"
+    if filters or projection or order != "top":
+        stmt, params = _page_query(conn, caps, filters, after, card, order, today)
+    elif sql["games_page"] is None:
+        stmt, params = None, ()
+    elif after is not None:
+        stmt, params = sql["games_page_after"], (after,)
+    else:
+        stmt, params = sql["games_page"], ()
+    # No card table yet (run materialize.py) -> behave like an empty catalog.
+    # One row past the page tells whether there is a next one.
+    rows = conn.execute(stmt, (*params, limit + 1, offset)).fetchall() if stmt else []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    headers: Dict[str, str] = {"X-Has-More": "true" if has_more else "false"}
+    if has_more and rows:
+        headers["X-Next-Cursor"] = _encode_cursor(rows[-1]["sort_key"])
+    total = _total(conn, caps, filters, order, today) if stmt else 0
+    if total is not None:
+        headers["X-Total-Count"] = str(total)
+
+    # Cards are stored pre-serialized; no per-row dicts, no JSON encoding here
+    body = b"[" + ",".join(r["card_json"] for r in rows).encode("utf-8") + b"]"
+    return _rendered(body, headers, None)
+
+
+def _total(conn: sqlite3.Connection, caps: SchemaCapabilities, filters: Dict[str, object],
+           order: str, today: Optional[str] = None) -> Optional[int]:
+    """
+    Games matching `filters`, without counting rows where possible: no filter
+    or a single genre / platform / tag / year range is a facet_counts lookup,
+    any other combination ANDs the in-memory facet bitsets. The date-bounded
+    new/upcoming feeds sum the per-day rollup split at today; they have no
+    total with filters (None), as there is no rollup to split those at a date.
+    Otherwise None only before the facet bitsets are first loaded.
+    """
+    sql = caps.sql
+    if order in ("new", "upcoming"):
+        if filters or sql[f"count_{order}"] is None:
+            return None
+        day = f"{today[:4]}-{today[4:6]}-{today[6:]}"
+        return conn.execute(sql[f"count_{order}"], (day,)).fetchone()[0]
+    if sql["count_value"] is not None:
+        keys = set(filters)
+        if not keys:
+            return conn.execute(sql["count_value"], ("all", "")).fetchone()[0]
+        if keys in ({"genre"}, {"platform"}, {"tag"}):
+            (name,) = keys
+            return conn.execute(sql["count_name"], (name, filters[name])).fetchone()[0]
+        if keys <= {"year_from", "year_to"}:
+            lo, hi = filters.get("year_from", 0), filters.get("year_to", 9999)
+            return conn.execute(sql["count_years"], ("%04d" % lo, "%04d" % hi)).fetchone()[0]
+    return facet_index.total(conn, filters)
+
+
+def _page_query(conn: sqlite3.Connection, caps: SchemaCapabilities, filters: Dict[str, object],
+                after: Optional[str], card: str = "c.card_json", order: str = "top",
+                today: Optional[str] = None) -> tuple:
+    """
+    SQL + params (minus LIMIT/OFFSET) for a filtered, projected or re-ordered
+    page, or (None, ()) when nothing can match. The most selective filter matching
+    fewer than FILTER_DRIVE_ROWS games drives the query (a link filter's
+    matches, or a year / metascore range on its game_cards index, then
+    sorted); otherwise the order's sort key index is walked in order and
+    every filter is a probe, so broad filters stop after `limit` hits.
+    """
+    sql = caps.sql
+    if sql["games_page"] is None or sql[f"order_{order}"] is None:
+        return None, ()
+    links = [(name, filters[name]) for name in LINK_TABLES if name in filters]
+    if any(sql[f"filter_{name}"] is None for name, _ in links):
+        return None, ()   # no such link table -> no game can match
+
+    driver, fewest = None, FILTER_DRIVE_ROWS
+    for name, value in links:
+        # Bounded count on the reverse index: never reads more than FILTER_DRIVE_ROWS entries
+        n = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM {LINK_TABLES[name]} WHERE {sql[f'filter_{name}']} LIMIT ?)",
+            (value, FILTER_DRIVE_ROWS),
+        ).fetchone()[0]
+        if n == 0:
+            return None, ()
+        if n < fewest:
+            driver, fewest = name, n
+
+    years = None
+    if "year_from" in filters or "year_to" in filters:
+        # released is 'YYYY[-MM-DD]': '-99' sorts after every date within year_to
+        years = ("%04d" % filters.get("year_from", 0), "%04d-99" % filters.get("year_to", 9999))
+    ranges = []
+    if years and sql["drive_year"]:
+        if sql["count_years"]:
+            # Exact, from the year rollup
+            n = conn.execute(sql["count_years"], (years[0], years[1][:4])).fetchone()[0]
+        else:
+            n = conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM game_cards WHERE released >= ? AND released < ? "
+                             "LIMIT ?)", (*years, FILTER_DRIVE_ROWS)).fetchone()[0]
+        ranges.append(("year", n))
+    # order=top already reads min_metascore as a range of its own sort key
+    if "min_metascore" in filters and order != "top" and sql["drive_metascore"]:
+        n = conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM game_cards WHERE metascore_number >= ? LIMIT ?)",
+                         (filters["min_metascore"], FILTER_DRIVE_ROWS)).fetchone()[0]
+        ranges.append(("metascore", n))
+    for name, n in ranges:
+        if n == 0:
+            return None, ()
+        if n < fewest:
+            driver, fewest = name, n
+
+    # The SQL text depends only on the query's shape, not on the values: build it once
+    # per shape (bounded LRU, so client-chosen combinations can't grow it without limit)
+    shape = (tuple(name for name, _ in links), driver, order, after is not None,
+             "min_metascore" in filters, years is not None, card)
+    stmt = caps.memo(("games_page",) + shape, lambda: _page_statement(sql, *shape))
+
+    # Parameters in the order _page_statement places their placeholders
+    params: List[object] = []
+    if driver in LINK_TABLES:
+        params.append(filters[driver])
+    if after is not None:
+        params.append(after)
+    if order == "new":
+        params += ["%08d" % (99999999 - int(today)), NO_DATE]
+    elif order == "upcoming":
+        params += [today + "~", NO_DATE]
+    if "min_metascore" in filters:
+        if order == "top":
+            params.append("%03d:" % (999 - filters["min_metascore"]))
+        params.append(filters["min_metascore"])
+    if years:
+        params += list(years)
+    params += [value for name, value in links if name != driver]
+    return stmt, tuple(params)
+
+
+def _page_statement(sql: Dict[str, Optional[str]], links: Tuple[str, ...], driver: Optional[str], order: str,
+                    after: bool, metascore: bool, years: bool, card: str) -> str:
+    """The SQL text behind _page_query for one query shape (filter names, driver, order)."""
+    column = ORDERS[order]
+    source, where = "game_cards c", []
+    if driver in RANGE_INDEXES:
+        # Range scan of the driving filter's index, then sorted
+        source = f"game_cards c INDEXED BY {sql[f'drive_{driver}']}"
+    elif driver:
+        # CROSS JOIN pins the join order: matches of the driving filter first, then the cards
+        source = (f"(SELECT DISTINCT game_id FROM {LINK_TABLES[driver]} WHERE {sql[f'filter_{driver}']}) d "
+                  f"CROSS JOIN game_cards c ON c.id = d.game_id")
+    # Unary + keeps a range that is not driving from being used as an index,
+    # so the planner stays on the sort key walk
+    year_col = "c.released" if driver == "year" else "+c.released"
+    meta_col = "c.metascore_number" if driver == "metascore" else "+c.metascore_number"
+    if after:
+        where.append(f"c.{column} > ?")
+    if order == "new":
+        # Keys start with 99999999 - YYYYMMDD: released <= today is a lower bound
+        where += ["c.sort_new >= ?", "c.sort_new < ?"]
+    elif order == "upcoming":
+        # Keys start with YYYYMMDD; '~' sorts after the id digits of today's games
+        where += ["c.sort_upcoming > ?", "c.sort_upcoming < ?"]
+    if metascore:
+        if order == "top":
+            # sort_top starts with 999 - metascore followed by digits, so this is also an
+            # upper bound on the index range (':' sorts right after '9')
+            where.append("c.sort_top < ?")
+        where.append(f"{meta_col} >= ?")
+    if years:
+        where += [f"{year_col} >= ?", f"{year_col} < ?"]
+    for name in links:
+        if name != driver:
+            # Correlated probe on the per-game index: O(links of one game) per visited card,
+            # instead of materializing every match of a broad filter up front
+            where.append(f"EXISTS (SELECT 1 FROM {LINK_TABLES[name]} WHERE game_id = c.id AND {sql[f'filter_{name}']})")
+
+    where_sql = "WHERE " + " AND ".join(where) if where else ""
+    return f"""
+        SELECT {card} AS card_json, c.{column} AS sort_key
+        FROM {source}
+        {where_sql}
+        ORDER BY c.{column}
         LIMIT ? OFFSET ?;
     """
 
-    rows = []
-    try:
-        cur.execute(select_sql, (limit, offset))
-        rows = cur.fetchall()
-    except sqlite3.OperationalError:
-        # If the 'games' table itself is missing, return []
-        conn.close()
-        return []
-
-    out: list[dict] = []
-    for r in rows:
-        # r keys present regardless of CTEs
-        item = {
-            "id": r["id"],
-            "slug": r["slug"],
-            "name": r["name"],
-            "released": r["released"],
-            "rating": r["rating"],
-            "metascore_number": r["metascore_number"],
-            "metascore_color": r["metascore_color"],
-            "screenshot": r["screenshot"],     # thumbnail for the card
-            "cover_image": r["cover_image"],   # keep existing field for detail fallback
-        }
-        # Add arrays if we had aggregates; otherwise default to []
-        item["genres"]    = _split_csv(r["genres_csv"])    if ("genres_csv" in r.keys()) else []
-        item["platforms"] = _split_csv(r["platforms_csv"]) if ("platforms_csv" in r.keys()) else []
-
-        out.append(item)
-
-    conn.close()
+
+class BatchRequest(BaseModel):
+    ids: List[int] = []
+    slugs: List[str] = []
+    shape: str = "card"
+
+
+@router.get("/games/batch")
+def get_games_batch(slugs: str = Query(..., description="comma-separated slugs"), shape: str = "card") -> Response:
+    """
+    Many games in one request: GET /games/batch?slugs=a,b,c&shape=card|detail.
+    Returns {"games": [...], "missing": [...]} with games in request order.
+    """
+    return batch_response(_split_keys(slugs.split(",")), "slug", shape)
+
+
+@router.post("/games/batch")
+def post_games_batch(req: BatchRequest) -> Response:
+    """Same as GET /games/batch, keyed by ids (or slugs) in a JSON body."""
+    if req.ids:
+        return batch_response(_split_keys(req.ids), "id", req.shape)
+    return batch_response(_split_keys(req.slugs), "slug", req.shape)
+
+
+def _split_keys(keys: list) -> list:
+    """Strip, drop blanks and duplicates (keeping first-seen order), enforce the batch cap."""
+    out = list(dict.fromkeys(k.strip() if isinstance(k, str) else k for k in keys))
+    out = [k for k in out if k != ""]
+    if len(out) > BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX} games per batch")
     return out
-    
+
+
+def batch_response(keys: list, by: str, shape: str, on_connection: OnConnection = None) -> Response:
+    """Blocking body of /games/batch: one set-based statement per shape, not one per game."""
+    if shape not in ("card", "detail"):
+        raise HTTPException(status_code=400, detail="shape must be 'card' or 'detail'")
+    docs: Dict = {}
+    if keys:
+        param = (json.dumps(keys),)
+        with _reader(on_connection) as conn:
+            sql = _statements(conn)
+            order = [f"batch_card_{by}"] if shape == "card" else [f"batch_detail_blob_{by}", f"batch_detail_{by}"]
+            for key in order:
+                if sql[key] and len(docs) < len(keys):
+                    for row in conn.execute(sql[key], param).fetchall():
+                        docs.setdefault(row[by], row[0])
+    found = [docs[k] for k in keys if k in docs]
+    missing = [k for k in keys if k not in docs]
+    body = (
+        b'{"games":[' + ",".join(found).encode("utf-8") + b'],"missing":'
+        + json.dumps(missing, ensure_ascii=False).encode("utf-8") + b"}"
+    )
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/games/stream")
+def stream_games(since: Optional[str] = None, after_id: int = 0) -> StreamingResponse:
+    """
+    The whole catalog as NDJSON: one card per line, in id order.
+    - `since`: only games updated at or after this UTC timestamp (e.g. 2025-09-28T12:00:00).
+    - `after_id`: resume after the last id received before a disconnect.
+    Read in STREAM_CHUNK-sized keyset chunks, each on a briefly borrowed pool
+    connection, so memory stays flat and a slow consumer never holds a connection.
+    """
+    since = _parse_since(since)
+
+    def lines() -> Iterator[bytes]:
+        last = after_id
+        while True:
+            chunk, last = stream_chunk(last, since)
+            if not chunk:
+                return
+            yield chunk
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _parse_since(since: Optional[str]) -> Optional[str]:
+    """ISO timestamp -> the 'YYYY-MM-DD HH:MM:SS' UTC text updated_at is stored as."""
+    if not since:
+        return None
+    try:
+        ts = datetime.fromisoformat(since.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since timestamp")
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def stream_chunk(after_id: int, since: Optional[str],
+                 on_connection: OnConnection = None) -> Tuple[bytes, int]:
+    """Next chunk of /games/stream after `after_id`: (NDJSON bytes, last id); b"" at the end."""
+    with _reader(on_connection) as conn:
+        sql = _statements(conn)
+        if sql["stream"] is None:
+            return b"", after_id
+        if since:
+            rows = conn.execute(sql["stream_since"], (after_id, since, STREAM_CHUNK)).fetchall()
+        else:
+            rows = conn.execute(sql["stream"], (after_id, STREAM_CHUNK)).fetchall()
+    if not rows:
+        return b"", after_id
+    return "".join(r["card_json"] + "\n" for r in rows).encode("utf-8"), rows[-1]["id"]
+
+
 @router.get("/games/{slug}")
-def get_game(slug: str) -> dict:
+def get_game(request: Request, slug: str, fields: Optional[str] = None) -> Response:
     """
     Detail for a single game by slug.
     Keeps existing fields and adds: developers, publishers, tags, website, age_rating,
     description, screenshots (list), media (list of images), stores (objects),
     and suggestions (objects).
+    The document is the blob pre-rendered by the enrichment writers (or, if that
+    is missing, rendered by SQLite in one statement) and is cached as bytes;
+    If-None-Match is answered with 304 like /games. There is no Last-Modified
+    when the document includes `suggestions`: those are other games' cards (and
+    a list build_suggestions rewrites), so this game's updated_at can't vouch for them.
+    `fields=name,stores` renders only those keys in SQL; the sub-selects behind the other
+    keys (media, suggestions, ...) are not part of the statement at all.
     """
-    conn = _connect()
-    cur = conn.cursor()
-
-    # --- Base row (exactly as before, plus safe optional columns via try/except) ---
-    cur.execute(
-        """
-        WITH genres_agg AS (
-            SELECT gg.game_id,
-                   GROUP_CONCAT(DISTINCT g.name) AS genres_csv
-            FROM game_genres gg
-            JOIN genres g ON g.id = gg.genre_id
-            GROUP BY gg.game_id
-        ),
-        platforms_agg AS (
-            SELECT gp.game_id,
-                   GROUP_CONCAT(DISTINCT p.name) AS platforms_csv
-            FROM game_platforms gp
-            JOIN platforms p ON p.id = gp.platform_id
-            GROUP BY gp.game_id
-        ),
-        first_shot AS (
-            SELECT s.game_id, MIN(s.id) AS first_id
-            FROM screenshots s
-            GROUP BY s.game_id
-        )
-        SELECT
-            games.id,
-            games.slug,
-            games.name,
-            games.released,
-            games.rating,
-            games.metascore_number,
-            games.metascore_color,
-            games.cover_image,
-            ga.genres_csv,
-            pa.platforms_csv,
-            s.url AS screenshot
-        FROM games
-        LEFT JOIN genres_agg    ga ON ga.game_id = games.id
-        LEFT JOIN platforms_agg pa ON pa.game_id = games.id
-        LEFT JOIN first_shot    fs ON fs.game_id = games.id
-        LEFT JOIN screenshots    s ON s.id = fs.first_id
-        WHERE games.slug = ?
-        LIMIT 1;
-        """,
-        (slug,),
-    )
-    row = cur.fetchone()
+    return game_response(request, slug, fields)
+
+
+def game_response(request: Request, slug: str, fields: Optional[str] = None,
+                  on_connection: OnConnection = None) -> Response:
+    """Blocking body of GET /games/{slug}, shared by the sync and async routers."""
+    projection = _fields(fields)   # checked against the schema's detail keys when rendering
+    return _cached_response(request, ("game", slug, projection),
+                            lambda conn: _render_game(conn, slug, projection), on_connection)
+
+
+def _render_game(conn: sqlite3.Connection, slug: str, projection: Optional[tuple] = None) -> CachedResponse:
+    if projection:
+        return _render_game_fields(conn, slug, projection)
+    sql = _statements(conn)
+    row = None
+    for key in ("game_detail_blob", "game_detail"):
+        if sql[key]:
+            row = conn.execute(sql[key], (slug,)).fetchone()
+            if row:
+                break
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Game not found")
+    # Strong ETag only: the suggestions embedded here change without this game's updated_at
+    return _rendered(row[0].encode("utf-8"), {}, None)
 
-    game_id = row["id"]
 
-    # Helper: safely query a single column from games (if column doesn't exist, return None)
-    def safe_scalar(column: str):
-        try:
-            c2 = conn.execute(f"SELECT {column} FROM games WHERE id = ? LIMIT 1;", (game_id,))
-            r2 = c2.fetchone()
-            return r2[0] if r2 and r2[0] is not None else None
-        except sqlite3.OperationalError:
-            return None
+def _render_game_fields(conn: sqlite3.Connection, slug: str, projection: tuple) -> CachedResponse:
+    caps = _caps(conn)
 
-    # Helper: safely return list[str] via join tables; if tables/columns missing, return []
-    def safe_group(sql: str, params: tuple) -> list[str]:
-        try:
-            c2 = conn.execute(sql, params)
-            return [r[0] for r in c2.fetchall() if r and r[0]]
-        except sqlite3.OperationalError:
-            return []
-
-    # ---------- Optional scalar fields on games ----------
-    website     = safe_scalar("website")
-    age_rating  = safe_scalar("age_rating")
-    description = safe_scalar("description")
-
-    # ---------- Developers / Publishers / Tags ----------
-    developers = safe_group(
-        """
-        SELECT DISTINCT d.name
-        FROM game_developers gd
-        JOIN developers d ON d.id = gd.developer_id
-        WHERE gd.game_id = ?
-        """,
-        (game_id,),
-    )
-    publishers = safe_group(
-        """
-        SELECT DISTINCT pu.name
-        FROM game_publishers gp
-        JOIN publishers pu ON pu.id = gp.publisher_id
-        WHERE gp.game_id = ?
-        """,
-        (game_id,),
-    )
-    tags = safe_group(
-        """
-        SELECT DISTINCT t.name
-        FROM game_tags gt
-        JOIN tags t ON t.id = gt.tag_id
-        WHERE gt.game_id = ?
-        """,
-        (game_id,),
-    )
+    def build() -> Optional[str]:
+        allowed = [name for name, _ in detail_fields(caps)]
+        _fields(",".join(projection), allowed)
+        live = detail_select(caps, projection)
+        return f"{live} WHERE c.slug = ? LIMIT 1;" if live else None
 
-    # ---------- Screenshots (full list) ----------
-    screenshots: list[str] = []
-    try:
-        c2 = conn.execute(
-            """
-            SELECT COALESCE(local_path, url) AS src
-            FROM screenshots
-            WHERE game_id = ?
-            ORDER BY COALESCE(sort_order, 999999), id
-            """,
-            (game_id,),
-        )
-        screenshots = [r[0] for r in c2.fetchall() if r and r[0]]
-    except sqlite3.OperationalError:
-        screenshots = []
+    # projection is sorted and de-duplicated (_fields), so equal field sets share one entry
+    stmt = caps.memo(("game_detail", projection), build)
+    row = conn.execute(stmt, (slug,)).fetchone() if stmt else None
+    if not row:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return _rendered(row[0].encode("utf-8"), {}, None if "suggestions" in projection else row[1])
 
-    # Map screenshots to MediaGallery’s expected shape (images only for now)
-    media = [{"type": "image", "url": src, "preview_url": None, "position": i} for i, src in enumerate(screenshots)]
 
-    # ---------- Stores (detailed objects for StoreButtons) ----------
-    stores: list[dict] = []
-    try:
-        c2 = conn.execute(
-            """
-            SELECT s.id AS store_id, s.name, s.slug, s.domain, gs.url,
-                   s.logo_url, s.hover_image_url
-            FROM game_stores gs
-            JOIN stores s ON s.id = gs.store_id
-            WHERE gs.game_id = ?
-            ORDER BY s.name COLLATE NOCASE ASC, s.id ASC
-            """,
-            (game_id,),
-        )
-        for r in c2.fetchall():
-            stores.append(
-                {
-                    "store_id": r["store_id"],
-                    "name": r["name"],
-                    "slug": r["slug"],
-                    "domain": r["domain"],
-                    "url": r["url"],
-                    "logo_url": r["logo_url"],
-                    "hover_image_url": r["hover_image_url"],
-                }
-            )
-    except sqlite3.OperationalError:
-        stores = []
+@router.get("/search")
+def search_games(request: Request, q: str, limit: int = Query(20, ge=1, le=SEARCH_MAX), offset: int = Query(0, ge=0)) -> Response:
+    """
+    Full-text search over names, descriptions, tags and developers.
+    - Every word must match, as a prefix ("witch 3" finds "The Witcher 3").
+    - bm25-ranked (name matches weigh most); ties fall back to the /games order.
+    - Returns /games cards, each with a `snippet` highlighting the match in <mark>.
+    """
+    return search_response(request, q, limit, offset)
 
-    # ---------- Suggestions (more like this) ----------
-    suggestions: list[dict] = []
-    try:
-        # Aggregate genres/platforms for suggested games too
-        c2 = conn.execute(
-            """
-            WITH ga AS (
-              SELECT gg.game_id, GROUP_CONCAT(DISTINCT g.name) AS genres_csv
-              FROM game_genres gg
-              JOIN genres g ON g.id = gg.genre_id
-              GROUP BY gg.game_id
-            ),
-            pa AS (
-              SELECT gp.game_id, GROUP_CONCAT(DISTINCT p.name) AS platforms_csv
-              FROM game_platforms gp
-              JOIN platforms p ON p.id = gp.platform_id
-              GROUP BY gp.game_id
-            ),
-            first_shot AS (
-              SELECT s.game_id, MIN(s.id) AS first_id
-              FROM screenshots s
-              GROUP BY s.game_id
-            )
-            SELECT
-              sug.position,
-              s.id          AS suggested_id,
-              s.name,
-              COALESCE(ss.url, s.cover_image) AS image_url,
-              pa.platforms_csv,
-              s.metascore_number,
-              s.metascore_color,
-              s.released,
-              ga.genres_csv
-            FROM suggestions sug
-            JOIN games s          ON s.id = sug.suggested_game_id
-            LEFT JOIN ga          ON ga.game_id = s.id
-            LEFT JOIN pa          ON pa.game_id = s.id
-            LEFT JOIN first_shot  fs ON fs.game_id = s.id
-            LEFT JOIN screenshots ss ON ss.id = fs.first_id
-            WHERE sug.game_id = ?
-            ORDER BY sug.position ASC, s.name COLLATE NOCASE ASC
-            LIMIT 24
-            """,
-            (game_id,),
-        )
-        for r in c2.fetchall():
-            suggestions.append(
-                {
-                    "position": r["position"],
-                    "suggested_id": r["suggested_id"],
-                    "name": r["name"],
-                    "image_url": r["image_url"],
-                    "platforms_csv": r["platforms_csv"],
-                    "metascore_number": r["metascore_number"],
-                    "metascore_color": r["metascore_color"],
-                    "released": r["released"],
-                    "genres_csv": r["genres_csv"],
-                }
-            )
-    except sqlite3.OperationalError:
-        suggestions = []
-
-    # ---------- Assemble response (includes everything you already returned) ----------
-    out = {
-        "id": row["id"],
-        "slug": row["slug"],
-        "name": row["name"],
-        "cover_image": row["cover_image"],
-        "screenshot": row["screenshot"],  # first-shot convenience
-        "released": row["released"],
-        "rating": row["rating"],
-        "metascore_number": row["metascore_number"],
-        "metascore_color": row["metascore_color"],
-        "genres": _split_csv(row["genres_csv"]),
-        "platforms": _split_csv(row["platforms_csv"]),
-        # New fields
-        "website": website,
-        "age_rating": age_rating,
-        "description": description,
-        "developers": developers,
-        "publishers": publishers,
-        "tags": tags,
-        "screenshots": screenshots,
-        "media": media,
-        "stores": stores,
-        "suggestions": suggestions,
-    }
 
-    conn.close()
-    return out
+def search_response(request: Request, q: str, limit: int, offset: int, on_connection: OnConnection = None) -> Response:
+    """Blocking body of GET /search, shared by the sync and async routers."""
+    match = _fts_query(q)
+    return _cached_response(request, ("search", match, limit, offset),
+                            lambda conn: _render_search(conn, match, limit, offset), on_connection)
+
+
+def _render_search(conn: sqlite3.Connection, match: Optional[str], limit: int, offset: int) -> CachedResponse:
+    stmt = _statements(conn)["search"]
+    if stmt is None:
+        raise HTTPException(status_code=503, detail="Search index not available")
+    rows = conn.execute(stmt, (match, limit, offset)).fetchall() if match else []
+    body = b"[" + ",".join(r["card_json"] for r in rows).encode("utf-8") + b"]"
+    # ETag only, like /games: matches entering or leaving the results move no row's updated_at
+    return _rendered(body, {}, None)
+
+
+@router.get("/facets")
+def get_facets(request: Request, filters: Dict[str, object] = Depends(game_filters)) -> Response:
+    """
+    Counts per genre, platform, top tag, release year and metascore band for the
+    games matching the same filters as /games. Each facet ignores its own filter,
+    so the sidebar can show the alternatives. Computed from in-memory bitsets.
+    """
+    return facets_response(request, filters)
+
+
+def facets_response(request: Request, filters: Dict[str, object], on_connection: OnConnection = None) -> Response:
+    """Blocking body of GET /facets, shared by the sync and async routers."""
+    active = _active(filters)
+    # Keyed by the bitset generation: once the watcher catches up with a commit,
+    # the next request misses and renders the new counts (nothing waits for it)
+    key = ("facets", active, facet_index.generation)
+    return _cached_response(request, key, lambda conn: _render_facets(conn, dict(active)), on_connection)
+
+
+def _render_facets(conn: sqlite3.Connection, filters: Dict[str, object]) -> CachedResponse:
+    body = json.dumps(facet_index.counts(conn, filters), ensure_ascii=False).encode("utf-8")
+    return _rendered(body, {}, None)
+
+
+@router.get("/autocomplete")
+def autocomplete(prefix: str, limit: int = Query(AUTOCOMPLETE_MAX, ge=1, le=AUTOCOMPLETE_MAX)) -> Response:
+    """
+    Typeahead: games whose name (or any word onward in it) or slug starts with `prefix`,
+    best first by the /games order. Served from memory; never queries the database.
+    """
+    return Response(content=names.lookup(prefix, limit), media_type="application/json")
+
+
+@router.get("/changes")
+def get_changes(after: int = Query(0, ge=0), limit: int = Query(CHANGES_MAX, ge=1, le=CHANGES_MAX)) -> dict:
+    """
+    Games changed after watermark `after` (a seq from a previous page's `next`),
+    oldest first: {"changes": [{seq, game_id, slug, version, changed_at, kind}], "next", "has_more"}.
+    410 when the log was pruned past `after`: rescan (e.g. /games/stream) and resume from `next`.
+    """
+    return changes_page(after, limit)
+
+
+def changes_page(after: int, limit: int, on_connection: OnConnection = None) -> dict:
+    with _reader(on_connection) as conn:
+        sql = _statements(conn)
+        if sql["changes"] is None:
+            raise HTTPException(status_code=404, detail="Change log not available")
+        if after < conn.execute(sql["changes_pruned"]).fetchone()[0]:
+            head = conn.execute(sql["changes_head"]).fetchone()
+            raise HTTPException(status_code=410, detail={"error": "Watermark expired",
+                                                         "next": head[0] if head else 0})
+        rows = conn.execute(sql["changes"], (after, limit)).fetchall()
+    return {"changes": [dict(r) for r in rows], "next": rows[-1]["seq"] if rows else after,
+            "has_more": len(rows) == limit}
+
+
+@router.get("/stats")
+def get_stats() -> dict:
+    """Operational counters for this worker (connection pool, response cache, in-memory indexes)."""
+    return stats()
+
+
+def stats() -> dict:
+    return {"pool": _pool.stats(), "cache": _cache.stats(), "autocomplete": names.stats(),
+            "facets": facet_index.stats(), "wal": checkpointer.stats()}
@@ -0,0 +1,219 @@
+# backend/games_api_async.py
+# Async variant of the games router (enable with LG_ASYNC_API=1).
+#
+# The sync router runs on AnyIO's shared threadpool, so a pile-up of slow list
+# queries starves every other route. Here the handlers are `async def` and hand
+# their SQLite work to a dedicated executor:
+#  - LG_DB_WORKERS threads (defaults to the pool size, one connection each),
+#  - at most LG_DB_QUEUE jobs queued or running; beyond that -> 503 right away,
+#  - LG_DB_TIMEOUT seconds per request; on expiry the running statement is
+#    interrupted (sqlite3 Connection.interrupt) and the client gets a 504.
+# Nothing else (health checks, docs) ever waits behind the database.
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+import games_api
+from db_pool import POOL_SIZE
+
+DB_WORKERS = int(os.environ.get("LG_DB_WORKERS", POOL_SIZE))
+DB_QUEUE   = int(os.environ.get("LG_DB_QUEUE", 64))
+DB_TIMEOUT = float(os.environ.get("LG_DB_TIMEOUT", 2.0))
+
+router = APIRouter()
+
+
+class _Cancelled(Exception):
+    """The request already timed out before this job reached the database."""
+
+
+class _Job:
+    """Tracks the connection a job is using so a timeout can interrupt it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.cancelled = False
+
+    def attach(self, conn: Optional[sqlite3.Connection]):
+        """Called with the checked-out connection, and with None before it returns to the pool."""
+        with self._lock:
+            if conn is not None and self.cancelled:
+                raise _Cancelled()
+            self._conn = conn
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None:
+                self._conn.interrupt()
+
+
+class DbExecutor:
+    def __init__(self, workers: int = DB_WORKERS, queue_limit: int = DB_QUEUE, timeout: float = DB_TIMEOUT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lg-db")
+        self._lock = threading.Lock()
+        self._pending = 0          # queued + running; only drops when the thread is really done
+        self._peak_pending = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args, on_connection=...) on a DB thread, bounded by queue depth and timeout."""
+        with self._lock:
+            if self._pending >= self.queue_limit:
+                self._rejected += 1
+                raise HTTPException(status_code=503, detail="Database busy", headers={"Retry-After": "1"})
+            self._pending += 1
+            self._submitted += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+
+        job = _Job()
+
+        def work():
+            try:
+                if job.cancelled:
+                    raise _Cancelled()
+                return fn(*args, on_connection=job.attach)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+        # Not wait_for(): cancelling the future would drop a still-queued job without
+        # running work(), and _pending would never come back down
+        future = asyncio.wrap_future(self._threads.submit(work))
+        future.add_done_callback(_retrieve)
+        done, _ = await asyncio.wait({future}, timeout=self.timeout)
+        if not done:
+            job.cancel()
+            with self._lock:
+                self._timed_out += 1
+            raise HTTPException(status_code=504, detail="Database query timed out")
+        return future.result()
+
+    def shutdown(self):
+        self._threads.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "timeout_s": self.timeout,
+                "pending": self._pending,
+                "peak_pending": self._peak_pending,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+            }
+
+
+def _retrieve(future: "asyncio.Future"):
+    # A job that outlived its timeout still finishes (often with _Cancelled or an
+    # interrupted query); its client already got a 504, so just mark the outcome seen
+    if not future.cancelled():
+        future.exception()
+
+
+_executor = DbExecutor()
+
+
+# ---------- Public Endpoints (same contract as games_api) ----------
+
+@router.get("/games")
+async def get_games(
+    request: Request,
+    limit: int = Query(60, ge=1, le=games_api.PAGE_MAX),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    order: str = "top",
+    filters: dict = Depends(games_api.game_filters),
+) -> Response:
+    """Async /games; see games_api.get_games."""
+    return await _executor.run(games_api.games_page_response, request, limit, offset, cursor, filters, fields, order)
+
+
+@router.get("/games/batch")
+async def get_games_batch(slugs: str = Query(..., description="comma-separated slugs"), shape: str = "card") -> Response:
+    """Async /games/batch; see games_api.get_games_batch."""
+    return await _executor.run(games_api.batch_response, games_api._split_keys(slugs.split(",")), "slug", shape)
+
+
+@router.post("/games/batch")
+async def post_games_batch(req: games_api.BatchRequest) -> Response:
+    """Async POST /games/batch; see games_api.post_games_batch."""
+    if req.ids:
+        return await _executor.run(games_api.batch_response, games_api._split_keys(req.ids), "id", req.shape)
+    return await _executor.run(games_api.batch_response, games_api._split_keys(req.slugs), "slug", req.shape)
+
+
+@router.get("/games/stream")
+async def stream_games(since: Optional[str] = None, after_id: int = 0) -> StreamingResponse:
+    """Async /games/stream; each chunk is its own DB executor job."""
+    since = games_api._parse_since(since)
+
+    async def lines():
+        last = after_id
+        while True:
+            chunk, last = await _executor.run(games_api.stream_chunk, last, since)
+            if not chunk:
+                return
+            yield chunk
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/games/{slug}")
+async def get_game(request: Request, slug: str, fields: Optional[str] = None) -> Response:
+    """Async /games/{slug}; see games_api.get_game."""
+    return await _executor.run(games_api.game_response, request, slug, fields)
+
+
+@router.get("/search")
+async def search_games(request: Request, q: str, limit: int = Query(20, ge=1, le=games_api.SEARCH_MAX),
+                       offset: int = Query(0, ge=0)) -> Response:
+    """Async /search; see games_api.search_games."""
+    return await _executor.run(games_api.search_response, request, q, limit, offset)
+
+
+@router.get("/facets")
+async def get_facets(request: Request, filters: dict = Depends(games_api.game_filters)) -> Response:
+    """Async /facets; see games_api.get_facets."""
+    return await _executor.run(games_api.facets_response, request, filters)
+
+
+@router.get("/autocomplete")
+async def autocomplete(prefix: str, limit: int = Query(games_api.AUTOCOMPLETE_MAX, ge=1, le=games_api.AUTOCOMPLETE_MAX)) -> Response:
+    """In-memory typeahead; runs on the event loop since it never touches the database."""
+    return Response(content=games_api.names.lookup(prefix, limit), media_type="application/json")
+
+
+@router.get("/changes")
+async def get_changes(after: int = Query(0, ge=0),
+                      limit: int = Query(games_api.CHANGES_MAX, ge=1, le=games_api.CHANGES_MAX)) -> dict:
+    """Async /changes; see games_api.get_changes."""
+    return await _executor.run(games_api.changes_page, after, limit)
+
+
+@router.get("/stats")
+async def get_stats() -> dict:
+    """Operational counters for this worker (pool, cache, DB executor)."""
+    return {**games_api.stats(), "executor": _executor.stats()}
+
+
+def shutdown():
+    _executor.shutdown()
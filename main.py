@@ -1,11 +1,19 @@
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
 
-app = FastAPI(title="LatestGames API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    build_read_models()
+    yield
+    stop_db_executor()
+
+app = FastAPI(title="LatestGames API", lifespan=lifespan)
 
 # Permissive CORS for demo; tighten in prod
 app.add_middleware(
@@ -14,11 +22,52 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paging metadata the /games grid reads from response headers
+    expose_headers=["X-Next-Cursor", "X-Has-More", "X-Total-Count"],
 )
 
-from games_api import router as games_router
-app.include_router(games_router)
+from games_api import router as games_router, DB_PATH, warm_up, names, facet_index, checkpointer
+
+# LG_ASYNC_API=1: async handlers on a dedicated, bounded DB executor (see games_api_async.py)
+ASYNC_API = os.environ.get("LG_ASYNC_API") == "1"
+if ASYNC_API:
+    import games_api_async
+    app.include_router(games_api_async.router)
+else:
+    app.include_router(games_router)
+
+from materialize import ensure_cards
+from migrations import migrate_file
+from publish import SERVE_DB, ensure_snapshot
+from db_pool import PoolTimeout
+
+@app.exception_handler(PoolTimeout)
+def pool_exhausted(request: Request, exc: PoolTimeout):
+    # Every pooled DB connection is busy; ask the client to back off instead of queueing forever
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+def build_read_models():
+    # Pending schema migrations, then a one-time backfill of the read models when they are empty or stale
+    if SERVE_DB:
+        # Serving a published snapshot: never write to it, update the source and (re)publish if needed
+        ensure_snapshot()
+    else:
+        migrate_file(DB_PATH)
+        ensure_cards(DB_PATH)
+    warm_up()
+    # In-memory typeahead index and facet bitsets: loaded now, then kept fresh by background threads
+    names.start()
+    facet_index.start()
+    checkpointer.start()
+
+def stop_db_executor():
+    names.stop()
+    facet_index.stop()
+    checkpointer.stop()
+    if ASYNC_API:
+        games_api_async.shutdown()
 
+# async so it runs on the event loop and never queues behind database work
 @app.get("/health")
-def health():
+async def health():
     return {"status":"ok"}
\ No newline at end of file
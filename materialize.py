@@ -0,0 +1,497 @@
+# backend/materialize.py
+# Denormalized read models kept in sync by the enrichment writers.
+#
+#  - game_cards: one row per game with everything the /games grid shows
+#    (thumbnail, genres, platforms) already joined, so the list endpoint reads
+#    a single indexed range instead of aggregating the whole catalog.
+#  - game_cards.sort_*: each /games ordering (top, new, rating, name,
+#    upcoming) flattened into one ascending text key with its own index, so
+#    every order and its keyset (cursor) pagination is a plain index range scan.
+#  - games.updated_at: bumped by the writers (touch_game) whenever a game's own
+#    data changes; copied onto the card for Last-Modified.
+#  - game_cards.card_json / game_details.detail_json: the exact JSON the API
+#    serves for a card and for /games/{slug}, rendered here once per change so
+#    requests just return bytes.
+#  - games_fts: FTS5 index (rowid = game id) over name, description, tags and
+#    developers for /search.
+#  - game_facets / facet_counts: which facet values (genre, platform, tag,
+#    year, metascore) each game has, and how many games have each value
+#    (facet 'all' = the whole catalog); the API turns game_facets into
+#    in-memory bitsets for /facets and reads facet_counts for /games totals.
+#
+# The tables themselves are created by migrations.py. Writers call
+# refresh_game(conn, gid) after they touch a game; the caller owns the commit.
+# `python materialize.py` rebuilds everything from scratch.
+
+import os, sqlite3
+from typing import List, Optional, Sequence
+from dotenv import load_dotenv
+
+from migrations import NOW_SQL, migrate
+from schema_registry import SchemaCapabilities, SchemaRegistry
+import wal
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+DB_FILE = os.environ.get("LG_DB", "latestgames.db")
+
+
+def touch_game(conn: sqlite3.Connection, gid: int):
+    """Mark a game as changed (drives Last-Modified). Does not commit."""
+    conn.execute(f"UPDATE games SET updated_at = {NOW_SQL} WHERE id = ?", (gid,))
+
+
+# --- Sort keys ---
+
+# "top" order: COALESCE(metascore, 0) DESC, rating DESC (NULLs last),
+# name COLLATE NOCASE ASC, id ASC -- encoded so plain ascending text order
+# reproduces it. lower() is ASCII-only, exactly like NOCASE.
+SORT_TOP_SQL = """
+    printf('%03d', 999 - COALESCE(g.metascore_number, 0))
+    || printf('%010.4f', 9999 - COALESCE(g.rating, -1))
+    || lower(COALESCE(g.name, '')) || char(31)
+    || printf('%012d', g.id)
+"""
+
+# Release date as YYYYMMDD, for games with a full date; the rest sort last (NO_DATE)
+DATED_SQL = "g.released GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
+RELEASED_INT_SQL = "CAST(replace(substr(g.released, 1, 10), '-', '') AS INTEGER)"
+NO_DATE = "99999999"   # sorts after every dated key; feeds with a date range stop before it
+
+# The other /games orders, encoded the same way (all ascending text):
+#   new:      released DESC, id DESC (the API keeps released <= today)
+#   upcoming: released ASC, id ASC (the API keeps released > today)
+#   rating:   rating DESC (NULLs last), name, id
+#   name:     name COLLATE NOCASE, id
+SORT_KEYS_SQL = {
+    "sort_new": f"""
+        CASE WHEN {DATED_SQL} THEN printf('%08d', 99999999 - {RELEASED_INT_SQL}) ELSE '{NO_DATE}' END
+        || printf('%012d', 999999999999 - g.id)
+    """,
+    "sort_upcoming": f"""
+        CASE WHEN {DATED_SQL} THEN printf('%08d', {RELEASED_INT_SQL}) ELSE '{NO_DATE}' END
+        || printf('%012d', g.id)
+    """,
+    "sort_rating": """
+        printf('%010.4f', 9999 - COALESCE(g.rating, -1))
+        || lower(COALESCE(g.name, '')) || char(31)
+        || printf('%012d', g.id)
+    """,
+    "sort_name": """
+        lower(COALESCE(g.name, '')) || char(31)
+        || printf('%012d', g.id)
+    """,
+}
+
+
+# --- JSON rendering ---
+
+def json_list(select: str) -> str:
+    """Correlated scalar subquery -> JSON array (json() keeps it from being re-quoted as a string)."""
+    return f"json(COALESCE(({select}), '[]'))"
+
+# Distinct names linked to one game, as a JSON array
+NAMES_SQL = """
+    SELECT json_group_array(name) FROM (
+        SELECT DISTINCT d.name FROM {link} l JOIN {dim} d ON d.id = l.{key}
+        WHERE l.game_id = {gid} AND d.name IS NOT NULL AND d.name <> ''
+    )"""
+
+
+def detail_fields(caps: SchemaCapabilities) -> List[tuple]:
+    """
+    (key, SQL expression) pairs for the detail document, in response order.
+    Every sub-select is scoped to one game (c = game_cards, g = games) and
+    served by the per-game indexes, so nothing scans the whole catalog.
+    Missing tables/columns degrade to null / [] exactly like before.
+    """
+    empty = "json('[]')"
+
+    def scalar(col: str) -> str:
+        return f"g.{col}" if caps.has("games", col) else "NULL"
+
+    def names(link: str, key: str, dim: str) -> str:
+        if not (caps.has(link, "game_id", key) and caps.has(dim, "id", "name")):
+            return empty
+        return json_list(NAMES_SQL.format(link=link, key=key, dim=dim, gid="c.id"))
+
+    shots = empty
+    media = empty
+    if caps.has("screenshots", "game_id", "url", "local_path", "sort_order"):
+        ordered = """
+            SELECT COALESCE(local_path, url) AS src,
+                   ROW_NUMBER() OVER (ORDER BY COALESCE(sort_order, 999999), id) - 1 AS pos
+            FROM screenshots
+            WHERE game_id = c.id AND COALESCE(local_path, url) <> ''
+            ORDER BY pos"""
+        shots = json_list(f"SELECT json_group_array(src) FROM ({ordered})")
+        # MediaGallery’s expected shape (images only for now)
+        media = json_list(f"""
+            SELECT json_group_array(json_object('type', 'image', 'url', src, 'preview_url', NULL, 'position', pos))
+            FROM ({ordered})""")
+
+    stores = empty
+    if (caps.has("game_stores", "game_id", "store_id", "url")
+            and caps.has("stores", "id", "name", "slug", "domain", "logo_url", "hover_image_url")):
+        stores = json_list("""
+            SELECT json_group_array(json_object(
+                'store_id', store_id, 'name', name, 'slug', slug, 'domain', domain,
+                'url', url, 'logo_url', logo_url, 'hover_image_url', hover_image_url))
+            FROM (
+                SELECT s.id AS store_id, s.name, s.slug, s.domain, gs.url, s.logo_url, s.hover_image_url
+                FROM game_stores gs
+                JOIN stores s ON s.id = gs.store_id
+                WHERE gs.game_id = c.id
+                ORDER BY s.name COLLATE NOCASE ASC, s.id ASC
+            )""")
+
+    suggestions = empty
+    if caps.has("suggestions", "game_id", "suggested_game_id", "position"):
+        # Suggested games come straight from their card rows (one PK lookup each)
+        suggestions = json_list("""
+            SELECT json_group_array(json_object(
+                'position', position, 'suggested_id', suggested_id, 'name', name,
+                'image_url', image_url, 'platforms_csv', platforms_csv,
+                'metascore_number', metascore_number, 'metascore_color', metascore_color,
+                'released', released, 'genres_csv', genres_csv))
+            FROM (
+                SELECT sug.position, s.id AS suggested_id, s.name,
+                       COALESCE(s.screenshot, s.cover_image) AS image_url,
+                       s.platforms_csv, s.metascore_number, s.metascore_color, s.released, s.genres_csv
+                FROM suggestions sug
+                JOIN game_cards s ON s.id = sug.suggested_game_id
+                WHERE sug.game_id = c.id
+                ORDER BY sug.position ASC, s.name COLLATE NOCASE ASC
+                LIMIT 24
+            )""")
+
+    return [
+        ("id", "c.id"),
+        ("slug", "c.slug"),
+        ("name", "c.name"),
+        ("cover_image", "c.cover_image"),
+        ("screenshot", "c.screenshot"),     # first-shot convenience
+        ("released", "c.released"),
+        ("rating", "c.rating"),
+        ("metascore_number", "c.metascore_number"),
+        ("metascore_color", "c.metascore_color"),
+        ("genres", names("game_genres", "genre_id", "genres")),
+        ("platforms", names("game_platforms", "platform_id", "platforms")),
+        ("website", scalar("website")),
+        ("age_rating", scalar("age_rating")),
+        ("description", scalar("description")),
+        ("developers", names("game_developers", "developer_id", "developers")),
+        ("publishers", names("game_publishers", "publisher_id", "publishers")),
+        ("tags", names("game_tags", "tag_id", "tags")),
+        ("screenshots", shots),
+        ("media", media),
+        ("stores", stores),
+        ("suggestions", suggestions),
+    ]
+
+
+def detail_select(caps: SchemaCapabilities, fields: Optional[Sequence[str]] = None) -> Optional[str]:
+    """
+    SELECT that renders the /games/{slug} document as JSON text, plus
+    c.updated_at, c.id and c.slug. Callers append their own WHERE clause.
+    With `fields`, only those keys are rendered; the sub-selects of the
+    others are left out of the statement entirely.
+    """
+    if not (caps.has("game_cards", "updated_at") and caps.has("games")):
+        return None
+    pairs = detail_fields(caps)
+    if fields is not None:
+        pairs = [(key, expr) for key, expr in pairs if key in fields]
+    body = ",\n".join(f"'{key}', {expr}" for key, expr in pairs)
+    return f"""
+        SELECT json_object(
+{body}
+        ) AS detail_json, c.updated_at, c.id, c.slug
+        FROM game_cards c
+        JOIN games g ON g.id = c.id
+    """
+
+
+# --- Card refresh ---
+
+# Correlated subqueries hit the per-game indexes on the link tables, so this
+# costs O(links of one game) when scoped by id.
+CARD_SELECT = f"""
+SELECT
+    g.id,
+    g.slug,
+    g.name,
+    g.released,
+    g.rating,
+    g.metascore_number,
+    g.metascore_color,
+    COALESCE(
+        (SELECT s.url FROM screenshots s WHERE s.game_id = g.id ORDER BY s.id LIMIT 1),
+        g.cover_image
+    ) AS screenshot,
+    g.cover_image,
+    (SELECT GROUP_CONCAT(name) FROM (
+        SELECT DISTINCT ge.name
+        FROM game_genres gg
+        JOIN genres ge ON ge.id = gg.genre_id
+        WHERE gg.game_id = g.id
+    )) AS genres_csv,
+    (SELECT GROUP_CONCAT(name) FROM (
+        SELECT DISTINCT pf.name
+        FROM game_platforms gp
+        JOIN platforms pf ON pf.id = gp.platform_id
+        WHERE gp.game_id = g.id
+    )) AS platforms_csv,
+    {SORT_TOP_SQL} AS sort_top,
+    {",".join(f"{expr} AS {col}" for col, expr in SORT_KEYS_SQL.items())},
+    g.updated_at,
+    json_object(
+        'id', g.id,
+        'slug', g.slug,
+        'name', g.name,
+        'released', g.released,
+        'rating', g.rating,
+        'metascore_number', g.metascore_number,
+        'metascore_color', g.metascore_color,
+        'screenshot', COALESCE(
+            (SELECT s.url FROM screenshots s WHERE s.game_id = g.id ORDER BY s.id LIMIT 1),
+            g.cover_image
+        ),
+        'cover_image', g.cover_image,
+        'genres', {json_list(NAMES_SQL.format(link="game_genres", key="genre_id", dim="genres", gid="g.id"))},
+        'platforms', {json_list(NAMES_SQL.format(link="game_platforms", key="platform_id", dim="platforms", gid="g.id"))}
+    ) AS card_json
+FROM games g
+"""
+
+CARD_COLUMNS = (
+    "id, slug, name, released, rating, metascore_number, metascore_color, "
+    "screenshot, cover_image, genres_csv, platforms_csv, sort_top, "
+    + "".join(f"{col}, " for col in SORT_KEYS_SQL)
+    + "updated_at, card_json"
+)
+
+# Card keys -> game_cards expressions (alias c), for projections of the card JSON
+CARD_FIELDS = [
+    ("id", "c.id"),
+    ("slug", "c.slug"),
+    ("name", "c.name"),
+    ("released", "c.released"),
+    ("rating", "c.rating"),
+    ("metascore_number", "c.metascore_number"),
+    ("metascore_color", "c.metascore_color"),
+    ("screenshot", "c.screenshot"),
+    ("cover_image", "c.cover_image"),
+    ("genres", "json(c.card_json -> '$.genres')"),
+    ("platforms", "json(c.card_json -> '$.platforms')"),
+]
+
+def card_projection(fields: Sequence[str]) -> str:
+    """json_object(...) over game_cards c with only `fields`, in card order."""
+    return "json_object(" + ", ".join(f"'{key}', {expr}" for key, expr in CARD_FIELDS if key in fields) + ")"
+
+
+def refresh_card(conn: sqlite3.Connection, gid: int):
+    """Rebuild the card row for one game (or drop it if the game is gone)."""
+    cur = conn.execute(
+        f"INSERT OR REPLACE INTO game_cards ({CARD_COLUMNS}) {CARD_SELECT} WHERE g.id = ?",
+        (gid,)
+    )
+    if cur.rowcount == 0:
+        conn.execute("DELETE FROM game_cards WHERE id = ?", (gid,))
+
+
+# --- Search index ---
+
+def search_select(caps: SchemaCapabilities) -> Optional[str]:
+    """SELECT rowid, name, description, tags, developers FROM games g (caller appends WHERE)."""
+    if not caps.has("games_fts"):
+        return None
+    if caps.has("game_tags", "tag"):
+        tags = "(SELECT group_concat(tag, ' ') FROM game_tags WHERE game_id = g.id)"
+    elif caps.has("game_tags", "tag_id") and caps.has("tags", "name"):
+        tags = ("(SELECT group_concat(t.name, ' ') FROM game_tags gt JOIN tags t ON t.id = gt.tag_id "
+                "WHERE gt.game_id = g.id)")
+    else:
+        tags = "NULL"
+    if caps.has("game_developers", "developer_id") and caps.has("developers", "name"):
+        developers = ("(SELECT group_concat(d.name, ' ') FROM game_developers gd JOIN developers d ON d.id = gd.developer_id "
+                      "WHERE gd.game_id = g.id)")
+    elif caps.has("game_developers", "developer"):
+        developers = "(SELECT group_concat(developer, ' ') FROM game_developers WHERE game_id = g.id)"
+    else:
+        developers = "NULL"
+    description = "g.description" if caps.has("games", "description") else "NULL"
+    return f"SELECT g.id, g.name, {description}, {tags}, {developers} FROM games g"
+
+
+# --- Facets ---
+
+def facet_select(caps: SchemaCapabilities) -> Optional[str]:
+    """SELECT facet, value, game_id for every game (filter the outer query by game_id)."""
+    if not caps.has("game_cards", "released", "metascore_number"):
+        return None
+    parts = [
+        # One 'all' row per game: facet_counts then also carries the catalog total
+        "SELECT 'all' AS facet, '' AS value, id AS game_id FROM game_cards",
+        "SELECT 'year', substr(released, 1, 4), id FROM game_cards WHERE released GLOB '[0-9][0-9][0-9][0-9]*'",
+        "SELECT 'metascore', CAST(metascore_number AS TEXT), id FROM game_cards WHERE metascore_number IS NOT NULL",
+        # Full release dates, the ones the new/upcoming feeds list: their totals are
+        # the day rows up to / after today (not held as bitsets by the API)
+        "SELECT 'day', substr(released, 1, 10), id FROM game_cards "
+        "WHERE released GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'",
+    ]
+    # Link rows only count for games that have a card: orphans left behind by a
+    # deleted game must not inflate the facets or the /games totals
+    if caps.has("game_genres", "genre_id") and caps.has("genres", "name"):
+        parts.append("SELECT 'genre', d.name, l.game_id FROM game_genres l JOIN genres d ON d.id = l.genre_id "
+                     "JOIN game_cards c ON c.id = l.game_id WHERE d.name IS NOT NULL AND d.name <> ''")
+    if caps.has("game_platforms", "platform_id") and caps.has("platforms", "name"):
+        parts.append("SELECT 'platform', d.name, l.game_id FROM game_platforms l JOIN platforms d ON d.id = l.platform_id "
+                     "JOIN game_cards c ON c.id = l.game_id WHERE d.name IS NOT NULL AND d.name <> ''")
+    if caps.has("game_tags", "tag"):
+        parts.append("SELECT 'tag', l.tag, l.game_id FROM game_tags l JOIN game_cards c ON c.id = l.game_id "
+                     "WHERE l.tag IS NOT NULL AND l.tag <> ''")
+    elif caps.has("game_tags", "tag_id") and caps.has("tags", "name"):
+        parts.append("SELECT 'tag', d.name, l.game_id FROM game_tags l JOIN tags d ON d.id = l.tag_id "
+                     "JOIN game_cards c ON c.id = l.game_id WHERE d.name IS NOT NULL AND d.name <> ''")
+    # SQLite pushes an outer WHERE game_id = ? down into every branch of the UNION ALL
+    return "SELECT facet, value, game_id FROM (\n    " + "\n    UNION ALL ".join(parts) + "\n)"
+
+
+# Writer-side copy of the detail/search/facet SELECTs, rebuilt only when the schema changes
+_writer_sql = SchemaRegistry(lambda caps: {
+    "detail": detail_select(caps),
+    "search": search_select(caps),
+    "facets": facet_select(caps),
+    "suggested_by": "SELECT game_id FROM suggestions WHERE suggested_game_id = ?"
+                    if caps.has("suggestions", "game_id", "suggested_game_id") else None,
+})
+
+def refresh_detail(conn: sqlite3.Connection, gid: int):
+    """Re-render the /games/{slug} blob for one game (needs its card row first)."""
+    select = _writer_sql.get(conn).sql["detail"]
+    if select is None:
+        return
+    cur = conn.execute(
+        f"INSERT OR REPLACE INTO game_details (detail_json, updated_at, id, slug) {select} WHERE c.id = ?",
+        (gid,)
+    )
+    if cur.rowcount == 0:
+        conn.execute("DELETE FROM game_details WHERE id = ?", (gid,))
+
+
+def refresh_search(conn: sqlite3.Connection, gid: int):
+    """Re-index one game for /search (or drop it if the game is gone)."""
+    select = _writer_sql.get(conn).sql["search"]
+    if select is None:
+        return
+    conn.execute("DELETE FROM games_fts WHERE rowid = ?", (gid,))
+    conn.execute(f"INSERT INTO games_fts (rowid, name, description, tags, developers) {select} WHERE g.id = ?", (gid,))
+
+
+def refresh_facets(conn: sqlite3.Connection, gid: int):
+    """Re-derive one game's facet values and adjust facet_counts by the difference."""
+    select = _writer_sql.get(conn).sql["facets"]
+    if select is None:
+        return
+    old = set(conn.execute("SELECT facet, value FROM game_facets WHERE game_id = ?", (gid,)).fetchall())
+    conn.execute("DELETE FROM game_facets WHERE game_id = ?", (gid,))
+    conn.execute(f"INSERT OR IGNORE INTO game_facets (facet, value, game_id) {select} WHERE game_id = ?", (gid,))
+    new = set(conn.execute("SELECT facet, value FROM game_facets WHERE game_id = ?", (gid,)).fetchall())
+    conn.executemany("UPDATE facet_counts SET games = games - 1 WHERE facet = ? AND value = ?", old - new)
+    conn.executemany(
+        "INSERT INTO facet_counts (facet, value, games) VALUES (?, ?, 1) "
+        "ON CONFLICT (facet, value) DO UPDATE SET games = games + 1",
+        new - old,
+    )
+    if old - new:
+        conn.execute("DELETE FROM facet_counts WHERE games <= 0")
+
+
+def rebuild_facets(conn: sqlite3.Connection):
+    """Recompute both facet rollups from scratch. Does not commit."""
+    # Tells the API's in-memory views to reload rather than patch (db_pool.DataWatcher)
+    conn.execute("UPDATE read_models_state SET rebuilds = rebuilds + 1 WHERE id = 1")
+    conn.execute("DELETE FROM game_facets")
+    conn.execute("DELETE FROM facet_counts")
+    select = _writer_sql.get(conn).sql["facets"]
+    if select:
+        conn.execute(f"INSERT OR IGNORE INTO game_facets (facet, value, game_id) {select}")
+        conn.execute("INSERT INTO facet_counts (facet, value, games) "
+                     "SELECT facet, value, COUNT(*) FROM game_facets GROUP BY facet, value")
+
+
+def refresh_game(conn: sqlite3.Connection, gid: int):
+    """Bring every read model for `gid` up to date. Does not commit."""
+    refresh_card(conn, gid)
+    refresh_detail(conn, gid)
+    refresh_search(conn, gid)
+    refresh_facets(conn, gid)
+    # Detail blobs embed suggested games' cards; re-render the games pointing here
+    suggested_by = _writer_sql.get(conn).sql["suggested_by"]
+    if suggested_by:
+        for (src,) in conn.execute(suggested_by, (gid,)).fetchall():
+            if src != gid:
+                refresh_detail(conn, src)
+
+
+def rebuild_all(conn: sqlite3.Connection) -> int:
+    conn.execute("DELETE FROM game_cards")
+    conn.execute(f"INSERT INTO game_cards ({CARD_COLUMNS}) {CARD_SELECT}")
+    conn.execute("DELETE FROM game_details")
+    select = _writer_sql.get(conn).sql["detail"]
+    if select:
+        conn.execute(f"INSERT INTO game_details (detail_json, updated_at, id, slug) {select}")
+    search = _writer_sql.get(conn).sql["search"]
+    if search:
+        conn.execute("DELETE FROM games_fts")
+        conn.execute(f"INSERT INTO games_fts (rowid, name, description, tags, developers) {search}")
+        conn.execute("INSERT INTO games_fts (games_fts) VALUES ('optimize')")
+    rebuild_facets(conn)
+    n = conn.execute("SELECT COUNT(*) FROM game_cards").fetchone()[0]
+    conn.commit()
+    return n
+
+
+def _missing_search_index(conn: sqlite3.Connection) -> bool:
+    """games_fts exists (FTS5 available) but was never filled."""
+    if _writer_sql.get(conn).sql["search"] is None:
+        return False
+    return conn.execute("SELECT 1 FROM games_fts LIMIT 1").fetchone() is None
+
+
+def ensure_cards(db_path: str = DB_FILE):
+    """Backfill the read models when empty or stale (API startup; the schema is migrate()'s job)."""
+    conn = wal.connect(db_path)
+    try:
+        empty = conn.execute("SELECT 1 FROM game_cards LIMIT 1").fetchone() is None
+        # NULL card_json: a migration changed the card shape (see migrations.py)
+        stale = (conn.execute("SELECT 1 FROM game_cards WHERE card_json IS NULL LIMIT 1").fetchone()
+                 or conn.execute("SELECT 1 FROM game_details LIMIT 1").fetchone() is None
+                 or _missing_search_index(conn)
+                 or conn.execute("SELECT 1 FROM facet_counts WHERE facet = 'all'").fetchone() is None)
+        if (empty or stale) and conn.execute("SELECT 1 FROM games LIMIT 1").fetchone():
+            rebuild_all(conn)
+        conn.commit()
+    except sqlite3.OperationalError:
+        # Database not migrated yet; nothing to fill
+        pass
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Rebuild the API read models from the source tables.")
+    ap.add_argument("--only", choices=["facets"], help="rebuild just this read model")
+    args = ap.parse_args()
+    conn = wal.connect(DB_FILE)
+    migrate(conn)
+    if args.only == "facets":
+        rebuild_facets(conn)
+        conn.commit()
+        print(f"✅ Rebuilt facet rollups in {DB_FILE}")
+    else:
+        n = rebuild_all(conn)
+        print(f"✅ Rebuilt {n} game cards and detail documents in {DB_FILE}")
+    conn.close()
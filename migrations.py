@@ -0,0 +1,550 @@
+# backend/migrations.py
+# The database schema, as numbered migrations recorded in PRAGMA user_version.
+#
+#  - migrate(conn) applies the steps newer than the file's user_version, all in
+#    one IMMEDIATE transaction, and bumps user_version with them. Up to date it
+#    costs one PRAGMA read. main.py runs it at startup, every CLI before work.
+#  - Steps 1-4 describe the schema as the older scripts left it (db_prepare,
+#    fix_orphans_and_enrich.ensure_schema, add_indexes.sql, materialize), so
+#    they are idempotent: databases created by any of those start at
+#    user_version 0 and converge on the same tables and indexes.
+#  - Never edit a released step; append a new one. A step that changes what
+#    the read models contain nulls game_cards.card_json, which makes
+#    materialize.ensure_cards rebuild them on the next startup.
+#  - migrate_file opens through wal.connect, so the startup run also switches
+#    an old rollback-journal file to WAL (journal_mode is not a migration: it
+#    cannot change inside the migration transaction).
+#
+#   python migrations.py          # migrate LG_DB and print its version
+
+import os, sqlite3
+from typing import Callable, List, Tuple
+from dotenv import load_dotenv
+
+import wal
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+DB_FILE = os.environ.get("LG_DB", "latestgames.db")
+
+NOW_SQL = "strftime('%Y-%m-%d %H:%M:%S', 'now')"   # UTC
+
+
+# --- 1: source tables (the enrichment writers' layout) ---
+
+CORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    slug TEXT,
+    name TEXT,
+    description TEXT,
+    released TEXT,
+    rating REAL
+);
+
+CREATE TABLE IF NOT EXISTS genres (id INTEGER PRIMARY KEY, name TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS platforms (id INTEGER PRIMARY KEY, name TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS game_genres (
+    game_id INTEGER NOT NULL,
+    genre_id INTEGER NOT NULL,
+    PRIMARY KEY (game_id, genre_id)
+);
+CREATE TABLE IF NOT EXISTS game_platforms (
+    game_id INTEGER NOT NULL,
+    platform_id INTEGER NOT NULL,
+    PRIMARY KEY (game_id, platform_id)
+);
+
+CREATE TABLE IF NOT EXISTS game_developers (
+    game_id INTEGER NOT NULL,
+    developer TEXT NOT NULL,
+    PRIMARY KEY (game_id, developer)
+);
+CREATE TABLE IF NOT EXISTS game_publishers (
+    game_id INTEGER NOT NULL,
+    publisher TEXT NOT NULL,
+    PRIMARY KEY (game_id, publisher)
+);
+CREATE TABLE IF NOT EXISTS game_tags (
+    game_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (game_id, tag)
+);
+CREATE TABLE IF NOT EXISTS game_series_links (
+    game_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (game_id, name, url)
+);
+CREATE TABLE IF NOT EXISTS game_additions_links (
+    game_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (game_id, name, url)
+);
+
+-- Legacy screenshots table retained for compatibility
+CREATE TABLE IF NOT EXISTS screenshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_id INTEGER NOT NULL,
+    url TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS media (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_id INTEGER NOT NULL,
+    type TEXT NOT NULL CHECK(type IN ('image','video')),
+    url TEXT NOT NULL,
+    preview_url TEXT,
+    position INTEGER,
+    UNIQUE(game_id, type, url)
+);
+
+CREATE TABLE IF NOT EXISTS stores (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    slug TEXT,
+    domain TEXT,
+    logo_url TEXT,
+    hover_image_url TEXT
+);
+CREATE TABLE IF NOT EXISTS game_stores (
+    game_id INTEGER NOT NULL,
+    store_id INTEGER NOT NULL,
+    url TEXT,
+    PRIMARY KEY (game_id, store_id)
+);
+
+-- RAWG's "games like" list as scraped (see build_suggestions.py for ours)
+CREATE TABLE IF NOT EXISTS game_suggestions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    suggested_id INTEGER,
+    name TEXT,
+    image_url TEXT,
+    platforms_csv TEXT,
+    metascore_number INTEGER,
+    metascore_color TEXT,
+    released TEXT,
+    genres_csv TEXT,
+    UNIQUE(game_id, position)
+);
+"""
+
+# games columns added over time by the different scripts
+GAMES_COLUMNS = [
+    ("description", "TEXT"), ("about", "TEXT"), ("cover_image", "TEXT"), ("cover_thumb", "TEXT"),
+    ("website", "TEXT"), ("age_rating", "TEXT"), ("age", "INTEGER"),
+    ("metascore_number", "INTEGER"), ("metascore_color", "TEXT"), ("updated_at", "TEXT"),
+]
+
+
+def _core_tables(conn: sqlite3.Connection):
+    run_script(conn, CORE_SCHEMA)
+    cols = _columns(conn, "games")
+    for col, typ in GAMES_COLUMNS:
+        if col not in cols:
+            conn.execute(f"ALTER TABLE games ADD COLUMN {col} {typ}")
+    if "updated_at" not in cols:
+        conn.execute(f"UPDATE games SET updated_at = {NOW_SQL}")
+
+
+# --- 2: lookup indexes ---
+
+# Per-game lookups used by the detail render and the writers; (table, column, DDL)
+LOOKUP_INDEXES = [
+    ("games", "slug", "CREATE INDEX IF NOT EXISTS idx_games_slug ON games(slug)"),
+    ("games", "released", "CREATE INDEX IF NOT EXISTS idx_games_released ON games(released)"),
+    ("game_genres", "game_id", "CREATE INDEX IF NOT EXISTS idx_game_genres_gid ON game_genres(game_id)"),
+    ("game_platforms", "game_id", "CREATE INDEX IF NOT EXISTS idx_game_platforms_gid ON game_platforms(game_id)"),
+    ("game_developers", "game_id", "CREATE INDEX IF NOT EXISTS idx_dev_gid ON game_developers(game_id)"),
+    ("game_publishers", "game_id", "CREATE INDEX IF NOT EXISTS idx_pub_gid ON game_publishers(game_id)"),
+    ("game_tags", "game_id", "CREATE INDEX IF NOT EXISTS idx_tag_gid ON game_tags(game_id)"),
+    ("game_series_links", "game_id", "CREATE INDEX IF NOT EXISTS idx_series_gid ON game_series_links(game_id)"),
+    ("game_additions_links", "game_id", "CREATE INDEX IF NOT EXISTS idx_additions_gid ON game_additions_links(game_id)"),
+    ("screenshots", "game_id", "CREATE INDEX IF NOT EXISTS idx_shots_gid ON screenshots(game_id)"),
+    ("media", "game_id", "CREATE INDEX IF NOT EXISTS idx_media_gid_type ON media(game_id, type)"),
+    ("game_stores", "game_id", "CREATE INDEX IF NOT EXISTS idx_game_stores_gid ON game_stores(game_id)"),
+    ("stores", "slug", "CREATE UNIQUE INDEX IF NOT EXISTS idx_stores_slug ON stores(slug)"),
+    ("game_suggestions", "game_id", "CREATE INDEX IF NOT EXISTS idx_suggestions_gid ON game_suggestions(game_id)"),
+]
+
+# Reverse (value -> game) covering indexes for the /games filters. game_tags is
+# keyed by tag text in the enrichment layout and by tag_id in db_prepare's old one.
+FILTER_INDEXES = [
+    ("game_genres", "genre_id", "CREATE INDEX IF NOT EXISTS idx_game_genres_genre ON game_genres(genre_id, game_id)"),
+    ("game_platforms", "platform_id", "CREATE INDEX IF NOT EXISTS idx_game_platforms_platform ON game_platforms(platform_id, game_id)"),
+    ("game_tags", "tag", "CREATE INDEX IF NOT EXISTS idx_game_tags_tag ON game_tags(tag, game_id)"),
+    ("game_tags", "tag_id", "CREATE INDEX IF NOT EXISTS idx_game_tags_tag_id ON game_tags(tag_id, game_id)"),
+]
+
+# Same columns as an index above, created under another name by the older
+# scripts; every copy is one more B-tree to update on each write
+DUPLICATE_INDEXES = ["idx_game_devs_gid", "idx_game_pubs_gid", "idx_game_publishers_gid",
+                     "idx_game_tags_gid", "idx_media_gid"]
+
+
+def _lookup_indexes(conn: sqlite3.Connection):
+    for table, col, ddl in LOOKUP_INDEXES + FILTER_INDEXES:
+        if col in _columns(conn, table):
+            conn.execute(ddl)
+    for name in DUPLICATE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+# --- 3: API read models (filled by materialize.py) ---
+
+CARD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS game_cards (
+    id INTEGER PRIMARY KEY,
+    slug TEXT,
+    name TEXT,
+    released TEXT,
+    rating REAL,
+    metascore_number INTEGER,
+    metascore_color TEXT,
+    screenshot TEXT,          -- first screenshot, falls back to cover_image
+    cover_image TEXT,
+    genres_csv TEXT,
+    platforms_csv TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_game_cards_slug ON game_cards(slug);
+
+CREATE TABLE IF NOT EXISTS game_details (
+    id INTEGER PRIMARY KEY,
+    slug TEXT,
+    detail_json TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_game_details_slug ON game_details(slug);
+"""
+
+# Columns added after the first release of game_cards: (name, type, index DDL)
+CARD_EXTRA_COLUMNS = [
+    ("sort_top", "TEXT", "CREATE INDEX IF NOT EXISTS idx_game_cards_sort_top ON game_cards(sort_top)"),
+    ("updated_at", "TEXT", None),
+    ("card_json", "TEXT", None),
+    ("sort_new", "TEXT", "CREATE INDEX IF NOT EXISTS idx_game_cards_sort_new ON game_cards(sort_new)"),
+    ("sort_rating", "TEXT", "CREATE INDEX IF NOT EXISTS idx_game_cards_sort_rating ON game_cards(sort_rating)"),
+    ("sort_name", "TEXT", "CREATE INDEX IF NOT EXISTS idx_game_cards_sort_name ON game_cards(sort_name)"),
+    ("sort_upcoming", "TEXT", "CREATE INDEX IF NOT EXISTS idx_game_cards_sort_upcoming ON game_cards(sort_upcoming)"),
+]
+
+# Full-text index for /search. Contentful (stores its own copy of the text) so
+# snippet() works; prefix='2 3' makes short "ga*" style prefix queries cheap.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS games_fts USING fts5(
+    name, description, tags, developers,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+# Facet rollups for /facets. Values are the display text (genre/platform/tag
+# names, 'YYYY' years, metascores as text).
+FACET_SCHEMA = """
+CREATE TABLE IF NOT EXISTS game_facets (
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL,
+    game_id INTEGER NOT NULL,
+    PRIMARY KEY (facet, value, game_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_game_facets_game ON game_facets(game_id);
+
+CREATE TABLE IF NOT EXISTS facet_counts (
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (facet, value)
+) WITHOUT ROWID;
+"""
+
+
+def _read_models(conn: sqlite3.Connection):
+    run_script(conn, CARD_SCHEMA)
+    cols = _columns(conn, "game_cards")
+    added = False
+    for col, typ, index_sql in CARD_EXTRA_COLUMNS:
+        if col not in cols:
+            conn.execute(f"ALTER TABLE game_cards ADD COLUMN {col} {typ}")
+            added = True
+        if index_sql:
+            conn.execute(index_sql)
+    if added:
+        # Existing cards lack the new columns: have ensure_cards rebuild them
+        conn.execute("UPDATE game_cards SET card_json = NULL")
+    # Superseded by sort_top
+    conn.execute("DROP INDEX IF EXISTS idx_game_cards_top")
+
+    run_script(conn, FACET_SCHEMA)
+    try:
+        run_script(conn, FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5: /search reports itself unavailable
+        pass
+
+
+# --- 4: "more like this" (build_suggestions.py) ---
+
+SUGGESTIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS suggestions (
+    game_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,          -- 1..TOP_K, best first
+    suggested_game_id INTEGER NOT NULL,
+    score REAL,                         -- cosine similarity
+    PRIMARY KEY (game_id, position)
+) WITHOUT ROWID;
+-- refresh_game re-renders the games pointing at a changed game
+CREATE INDEX IF NOT EXISTS idx_suggestions_suggested ON suggestions(suggested_game_id);
+
+CREATE TABLE IF NOT EXISTS suggestions_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    built_at TEXT                       -- start of the last successful run (UTC)
+);
+"""
+
+
+# --- 5: developers / publishers / tags as integer-keyed dimensions ---
+
+# (link table, old text column, id column, dimension table)
+DIMENSIONS = [
+    ("game_developers", "developer", "developer_id", "developers"),
+    ("game_publishers", "publisher", "publisher_id", "publishers"),
+    ("game_tags", "tag", "tag_id", "tags"),
+]
+
+
+def _dimension_tables(conn: sqlite3.Connection):
+    for link, text, key, dim in DIMENSIONS:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {dim} (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+        # Writers resolve names through this index; unique unless old data already repeats a name
+        dupes = conn.execute(f"SELECT 1 FROM {dim} GROUP BY name HAVING COUNT(*) > 1 LIMIT 1").fetchone()
+        conn.execute(f"CREATE {'' if dupes else 'UNIQUE '}INDEX IF NOT EXISTS idx_{dim}_name ON {dim}(name)")
+
+        cols = _columns(conn, link)
+        if text in cols:
+            # Text layout: mint ids for the names in use, then swap in an integer link table
+            conn.execute(f"""
+                INSERT INTO {dim} (name)
+                SELECT DISTINCT {text} FROM {link}
+                WHERE {text} IS NOT NULL AND {text} <> '' AND {text} NOT IN (SELECT name FROM {dim})
+                ORDER BY {text}
+            """)
+            conn.execute(f"""
+                CREATE TABLE {link}_new (
+                    game_id INTEGER NOT NULL,
+                    {key} INTEGER NOT NULL,
+                    PRIMARY KEY (game_id, {key})
+                ) WITHOUT ROWID
+            """)
+            conn.execute(f"""
+                INSERT OR IGNORE INTO {link}_new (game_id, {key})
+                SELECT l.game_id, d.id FROM {link} l JOIN {dim} d ON d.name = l.{text}
+            """)
+            conn.execute(f"DROP TABLE {link}")
+            conn.execute(f"ALTER TABLE {link}_new RENAME TO {link}")
+        elif key not in cols:
+            continue
+        # The primary key serves per-game lookups; this one serves "games with tag X"
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{link}_{key} ON {link}({key}, game_id)")
+
+    # Detail documents now carry developers / publishers / tags: re-render them
+    if _columns(conn, "game_cards"):
+        conn.execute("UPDATE game_cards SET card_json = NULL")
+
+
+# --- 6: change log (read and pruned by changes.py) ---
+
+CHANGES_SCHEMA = """
+-- One row per change to a game or its child rows; seq is the consumers' watermark
+-- (AUTOINCREMENT: never reused, even after the newest rows are pruned)
+CREATE TABLE IF NOT EXISTS game_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_id INTEGER NOT NULL,
+    version INTEGER NOT NULL,           -- games.version after this change
+    changed_at TEXT NOT NULL,           -- UTC
+    kind TEXT NOT NULL                  -- source table: games, game_tags, media, ...
+);
+CREATE INDEX IF NOT EXISTS idx_game_changes_game ON game_changes(game_id, seq);
+
+CREATE TABLE IF NOT EXISTS game_changes_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    pruned_through INTEGER NOT NULL     -- highest seq dropped by retention; older watermarks must rescan
+);
+INSERT OR IGNORE INTO game_changes_state (id, pruned_through) VALUES (1, 0);
+"""
+
+# Child tables whose rows show up in a game's card or detail document
+CHANGE_TABLES = ["game_genres", "game_platforms", "game_developers", "game_publishers", "game_tags",
+                 "game_series_links", "game_additions_links", "media", "game_stores", "game_suggestions"]
+
+# Bump the game's version and log it. A write that adds a game's tags one row at
+# a time would log one row per tag, so the newest row is replaced (new seq) when
+# it is for the same game and table: a consumer that already read it still sees
+# the replacement, since its seq is higher.
+_LOG_CHANGE = f"""
+    UPDATE games SET version = version + 1 WHERE id = {{gid}};
+    DELETE FROM game_changes
+     WHERE seq = (SELECT max(seq) FROM game_changes) AND game_id = {{gid}} AND kind = '{{kind}}';
+    INSERT INTO game_changes (game_id, version, changed_at, kind)
+    VALUES ({{gid}}, {{version}}, {NOW_SQL}, '{{kind}}');
+"""
+
+
+def _change_log(conn: sqlite3.Connection):
+    if "version" not in _columns(conn, "games"):
+        conn.execute("ALTER TABLE games ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    run_script(conn, CHANGES_SCHEMA)
+    # build_suggestions --changed resumes from here instead of comparing updated_at
+    if "change_seq" not in _columns(conn, "suggestions_state"):
+        conn.execute("ALTER TABLE suggestions_state ADD COLUMN change_seq INTEGER")
+
+    def trigger(name: str, event: str, table: str, gid: str, version: str, when: str = ""):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        body = _LOG_CHANGE.format(gid=gid, version=version, kind=table)
+        conn.execute(f"CREATE TRIGGER {name} AFTER {event} ON {table} {when} BEGIN {body} END")
+
+    current = "(SELECT version FROM games WHERE id = {})"
+    trigger("trg_games_insert", "INSERT", "games", "NEW.id", current.format("NEW.id"))
+    # Only real data changes: touch_game (updated_at) and the version bump itself don't count.
+    # The column list is fixed here; a migration that adds a games column recreates this trigger.
+    data = sorted(_columns(conn, "games") - {"version", "updated_at"})
+    changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in data)
+    trigger("trg_games_update", "UPDATE", "games", "NEW.id", current.format("NEW.id"), f"WHEN {changed}")
+    trigger("trg_games_delete", "DELETE", "games", "OLD.id", "OLD.version + 1")
+
+    for table in CHANGE_TABLES:
+        if not _columns(conn, table):
+            continue
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            gid = f"{row}.game_id"
+            trigger(f"trg_{table}_{event.lower()}", event, table, gid, f"COALESCE({current.format(gid)}, 0)")
+
+
+# --- 7: range filter indexes ---
+
+# Let a narrow year range or a high min_metascore drive a /games page
+# (games_api._page_query) instead of filtering a walk of the sort key index
+RANGE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_game_cards_released ON game_cards(released);
+CREATE INDEX IF NOT EXISTS idx_game_cards_metascore ON game_cards(metascore_number);
+"""
+
+
+# --- 8: case-insensitive tag lookups ---
+
+# tag= matches names COLLATE NOCASE like genre/platform; a BINARY index can't
+# serve that, so the tag name and the rarer-tag facet lookup get NOCASE twins
+TAG_NOCASE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_tags_name_nocase ON tags(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_game_facets_nocase ON game_facets(facet, value COLLATE NOCASE);
+"""
+
+
+# --- 9: facet rollups without orphan links ---
+
+# Older rollups counted link rows of deleted games (facet_select now joins game_cards)
+
+def _stale_facets(conn: sqlite3.Connection):
+    # Without the 'all' rows materialize.ensure_cards rebuilds both rollups on startup
+    conn.execute("DELETE FROM facet_counts WHERE facet = 'all'")
+
+
+# --- 10: per-day release rollup (new/upcoming totals) ---
+
+# Rebuilt through _stale_facets like step 9, now with 'day' rows
+
+
+# --- 11: read model rebuild counter ---
+
+# The API's in-memory views (facet bitsets, typeahead) patch themselves from
+# cards with a newer updated_at; a full rebuild doesn't move updated_at, so it
+# bumps this instead and they reload (db_pool.DataWatcher)
+READ_MODELS_STATE = """
+CREATE TABLE IF NOT EXISTS read_models_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    rebuilds INTEGER NOT NULL           -- full rebuilds so far
+);
+INSERT OR IGNORE INTO read_models_state (id, rebuilds) VALUES (1, 0);
+"""
+
+
+# --- Engine ---
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "source tables", _core_tables),
+    (2, "lookup and filter indexes", _lookup_indexes),
+    (3, "API read models", _read_models),
+    (4, "suggestions", lambda conn: run_script(conn, SUGGESTIONS_SCHEMA)),
+    (5, "developer / publisher / tag dimensions", _dimension_tables),
+    (6, "change log", _change_log),
+    (7, "range filter indexes", lambda conn: run_script(conn, RANGE_INDEXES)),
+    (8, "case-insensitive tag indexes", lambda conn: run_script(conn, TAG_NOCASE_INDEXES)),
+    (9, "facet rollups without orphan links", _stale_facets),
+    (10, "per-day release rollup", _stale_facets),
+    (11, "read model rebuild counter", lambda conn: run_script(conn, READ_MODELS_STATE)),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def run_script(conn: sqlite3.Connection, script: str):
+    """executescript() without its implicit COMMIT, so steps stay in one transaction."""
+    stmt = ""
+    for line in script.splitlines(keepends=True):
+        stmt += line
+        if sqlite3.complete_statement(stmt):
+            conn.execute(stmt)
+            stmt = ""
+    if stmt.strip():
+        conn.execute(stmt)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> List[int]:
+    """Apply pending migrations in one transaction. Returns the versions applied."""
+    if schema_version(conn) >= LATEST:
+        return []
+    conn.commit()   # a transaction the caller left open would swallow our BEGIN
+    level, conn.isolation_level = conn.isolation_level, None
+    try:
+        # IMMEDIATE takes the write lock now; re-read in case another process just migrated
+        conn.execute("BEGIN IMMEDIATE")
+        current = schema_version(conn)
+        applied = []
+        for version, _, step in MIGRATIONS:
+            if version > current:
+                step(conn)
+                applied.append(version)
+        if applied:
+            conn.execute(f"PRAGMA user_version = {applied[-1]}")
+        conn.execute("COMMIT")
+        return applied
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = level
+
+
+def migrate_file(db_path: str = DB_FILE) -> List[int]:
+    conn = wal.connect(db_path)
+    try:
+        return migrate(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    applied = migrate_file(DB_FILE)
+    conn = sqlite3.connect(DB_FILE)
+    print(f"✅ {DB_FILE}: schema version {schema_version(conn)}"
+          + (f" (applied {', '.join(map(str, applied))})" if applied else " (up to date)"))
+    conn.close()
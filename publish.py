@@ -0,0 +1,111 @@
+# backend/publish.py
+# Publish a read-only snapshot of the writers' database for the API.
+#
+# With LG_SERVE_DB set, the writers (enrichment, fetch_games,
+# build_suggestions) keep working on LG_DB and the API serves LG_SERVE_DB
+# instead, so request latency no longer depends on what a writer is doing:
+#  - publish(): VACUUM INTO a temp file next to the target (one consistent
+#    read transaction on the source, so a running writer is neither blocked
+#    nor half-copied; the copy comes out defragmented and in rollback-journal
+#    mode), ANALYZE it, quick_check it, fsync it, then os.replace() it over
+#    LG_SERVE_DB in one atomic rename.
+#  - The API notices the new inode on its next checkout (db_pool.ReadPool):
+#    idle connections are reopened on the new file, busy ones are closed when
+#    returned, and the response cache, typeahead and facet bitsets reload. No
+#    restart, and no request ever sees a partially written file.
+#  - ensure_snapshot(): API startup. Migrates and backfills the source, and
+#    publishes when the snapshot is missing or behind on schema.
+#
+#   python publish.py             # publish LG_DB -> LG_SERVE_DB now
+
+import os, sqlite3, time
+from typing import Optional
+from urllib.parse import quote
+from dotenv import load_dotenv
+
+from materialize import ensure_cards
+from migrations import LATEST, migrate_file, schema_version
+import wal
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+DB_FILE = os.environ.get("LG_DB", "latestgames.db")
+SERVE_DB: Optional[str] = os.environ.get("LG_SERVE_DB") or None   # unset: the API reads LG_DB directly
+
+
+class PublishError(Exception):
+    """The snapshot failed its integrity check; the published file was left alone."""
+
+
+def _fsync(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def publish(src: str = DB_FILE, dest: Optional[str] = SERVE_DB) -> dict:
+    """Snapshot `src`, analyze it and atomically replace `dest` with it."""
+    if not dest:
+        raise ValueError("no snapshot path (set LG_SERVE_DB)")
+    t0 = time.time()
+    tmp = f"{dest}.tmp-{os.getpid()}"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        conn = wal.connect(src)
+        try:
+            conn.execute("VACUUM INTO ?", (tmp,))
+        finally:
+            conn.close()
+
+        snap = sqlite3.connect(tmp)
+        try:
+            snap.execute("ANALYZE")
+            snap.commit()
+            check = snap.execute("PRAGMA quick_check").fetchone()[0]
+            version = schema_version(snap)
+        finally:
+            snap.close()
+        if check != "ok":
+            raise PublishError(f"snapshot of {src} failed quick_check: {check}")
+
+        _fsync(tmp)
+        os.replace(tmp, dest)
+        # The rename itself is only durable once the directory entry is
+        _fsync(os.path.dirname(os.path.abspath(dest)))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return {"path": dest, "bytes": os.path.getsize(dest), "schema_version": version,
+            "seconds": round(time.time() - t0, 2)}
+
+
+def after_batch(src: str = DB_FILE):
+    """Writers call this once a batch is committed; publishes only when LG_SERVE_DB is set."""
+    if SERVE_DB:
+        stats = publish(src, SERVE_DB)
+        print(f"✅ Published {stats['path']} ({stats['bytes'] // 1024} KiB, {stats['seconds']}s)")
+
+
+def ensure_snapshot(src: str = DB_FILE, dest: Optional[str] = SERVE_DB):
+    """API startup: bring the source up to date, then publish if the snapshot is missing or stale."""
+    migrate_file(src)
+    ensure_cards(src)
+    if os.path.exists(dest):
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(dest))}?mode=ro", uri=True)
+        try:
+            if schema_version(conn) >= LATEST:
+                return
+        finally:
+            conn.close()
+    publish(src, dest)
+
+
+if __name__ == "__main__":
+    if not SERVE_DB:
+        raise SystemExit("LG_SERVE_DB is not set; nothing to publish to.")
+    migrate_file(DB_FILE)
+    ensure_cards(DB_FILE)
+    after_batch()
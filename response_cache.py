@@ -0,0 +1,154 @@
+# backend/response_cache.py
+# Bounded in-process LRU for rendered API responses.
+#
+#  - Entries are the final response bytes (+ headers), keyed by endpoint and
+#    query parameters; the budget is in bytes, not entries.
+#  - invalidate() drops everything and bumps an epoch. Renders that started
+#    before the bump are not stored, so a slow request can't re-insert data
+#    that was read before an enrichment commit.
+#  - Bodies of COMPRESS_MIN_BYTES or more are compressed once, when the entry
+#    is stored, and the gzip / brotli bytes are kept next to the identity
+#    body; requests only pick a variant (negotiate()). Responses too big to
+#    cache get just the one encoding their client asked for. Callers do this
+#    after giving back their database connection. brotli is in
+#    requirements.txt; without it only gzip is offered.
+
+from __future__ import annotations
+
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Sequence
+
+try:
+    import brotli
+except ImportError:   # pip install brotli to also serve Content-Encoding: br
+    brotli = None
+
+CACHE_MAX_MB = float(os.environ.get("LG_RESPONSE_CACHE_MB", 64))
+COMPRESS_MIN_BYTES = int(os.environ.get("LG_COMPRESS_MIN_BYTES", 1024))   # smaller bodies go out as-is
+GZIP_LEVEL    = 6
+BROTLI_QUALITY = 9
+
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _encode(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL, mtime=0)
+
+
+def negotiate(accept_encoding: Optional[str], available) -> Optional[str]:
+    """Best of `available` encodings the client accepts (br over gzip), None for identity."""
+    if not accept_encoding or not available:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    best = None
+    for enc in ("br", "gzip"):
+        q = accepted.get(enc, accepted.get("*", 0.0))
+        if enc in available and q > 0 and (best is None or q > best[1]):
+            best = (enc, q)
+    return best[0] if best else None
+
+
+class CachedResponse:
+    __slots__ = ("body", "headers", "encoded", "size")
+
+    def __init__(self, body: bytes, headers: Dict[str, str]):
+        self.body = body
+        self.headers = headers
+        self.encoded: Dict[str, bytes] = {}   # encoding -> bytes, filled by compress()
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers.items())
+
+    def compress(self, encodings: Sequence[str] = ENCODINGS):
+        """Add the `encodings` variants worth sending (each smaller than the body)."""
+        if len(self.body) < COMPRESS_MIN_BYTES:
+            return
+        for enc in encodings:
+            if enc not in self.encoded:
+                data = _encode(self.body, enc)
+                if len(data) < len(self.body):
+                    self.encoded[enc] = data
+                    self.size += len(data)
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = int(CACHE_MAX_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 8   # one huge page must not flush the whole cache
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self.epoch = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key: Hashable, entry: CachedResponse, epoch: int) -> bool:
+        """
+        Compress and store `entry` unless it is too big or the cache was
+        invalidated since `epoch` was read. True if stored.
+        """
+        if entry.size > self.max_entry_bytes or epoch != self.epoch:
+            return False
+        entry.compress()   # outside the lock: other requests keep hitting the cache meanwhile
+        with self._lock:
+            if epoch != self.epoch:
+                return False
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._evictions += 1
+        return True
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.epoch += 1
+            self._invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else None,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "epoch": self.epoch,
+                "encodings": list(ENCODINGS),
+            }
@@ -0,0 +1,83 @@
+# backend/schema_registry.py
+# Schema capabilities, detected once and cached until the schema changes.
+#
+# The API used to probe sqlite_master (or catch OperationalError) on every
+# request to find out which optional tables/columns exist. Instead we read the
+# schema once, hand it to a statement builder that produces the final SQL for
+# each endpoint, and only redo that work when PRAGMA schema_version (or the
+# pool generation, i.e. the database file itself) changes.
+#
+# SQL that depends on the request's shape (a ?fields= set, a filter
+# combination) is memoized per schema version too, but in a bounded LRU
+# (LG_STATEMENT_MEMO entries): clients choose those shapes, so an unbounded
+# dict would grow with every new query string.
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Set, Tuple, TypeVar
+
+STATEMENT_MEMO = int(os.environ.get("LG_STATEMENT_MEMO", 256))
+
+T = TypeVar("T")
+
+
+class SchemaCapabilities:
+    def __init__(self, version: int, tables: Dict[str, Set[str]], indexes: Optional[Set[str]] = None):
+        self.version = version
+        self.tables = tables              # table/virtual table name -> column names
+        self.indexes = indexes or set()   # index names (for INDEXED BY)
+        self.sql: Dict[str, Optional[str]] = {}
+        self._memo: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    def has(self, table: str, *columns: str) -> bool:
+        cols = self.tables.get(table)
+        return cols is not None and all(c in cols for c in columns)
+
+    def has_index(self, name: str) -> bool:
+        return name in self.indexes
+
+    def memo(self, key: Hashable, build: Callable[[], T]) -> T:
+        """build() once per key (LRU, STATEMENT_MEMO entries); exceptions are not stored."""
+        with self._memo_lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+            value = self._memo[key] = build()
+            if len(self._memo) > STATEMENT_MEMO:
+                self._memo.popitem(last=False)
+            return value
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> "SchemaCapabilities":
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        tables: Dict[str, Set[str]] = {}
+        names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")]
+        for name in names:
+            tables[name] = {r[1] for r in conn.execute(f"PRAGMA table_info(\"{name}\")")}
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        return cls(version, tables, indexes)
+
+
+class SchemaRegistry:
+    """Caches SchemaCapabilities plus the SQL built from them."""
+
+    def __init__(self, build_statements: Callable[[SchemaCapabilities], Dict[str, Optional[str]]]):
+        self._build = build_statements
+        self._lock = threading.Lock()
+        self._caps: Optional[SchemaCapabilities] = None
+        self._key: Optional[Tuple[int, int]] = None
+
+    def get(self, conn: sqlite3.Connection, generation: int = 0) -> SchemaCapabilities:
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        # Check and rebuild under one lock, so _caps and _key are never read half-swapped
+        with self._lock:
+            if self._caps is None or self._key != (generation, version):
+                caps = SchemaCapabilities.load(conn)
+                caps.sql = self._build(caps)
+                self._caps, self._key = caps, (generation, caps.version)
+            return self._caps
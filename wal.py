@@ -0,0 +1,123 @@
+# backend/wal.py
+# WAL journaling so enrichment and serving can share one database file.
+#
+# In rollback-journal mode every writer commit (fix_orphans_and_enrich commits
+# after each upsert helper) locks readers out, and API requests stall or fail
+# with "database is locked". In WAL mode readers keep reading their snapshot
+# while the writer appends to latestgames.db-wal; what is left to manage is
+# copying the WAL back into the main file (the checkpoint):
+#  - connect(): every writing script opens the database through here. It turns
+#    WAL on (the mode is stored in the file, so the read-only API pool follows),
+#    with synchronous=NORMAL and the shared busy timeout.
+#  - Checkpointer: API-side daemon thread. While the read pool is in use it runs
+#    PASSIVE checkpoints, which never wait and never block anyone; once the pool
+#    has been idle for LG_CHECKPOINT_IDLE seconds it runs TRUNCATE, which resets
+#    the -wal file to zero bytes. It never waits on busy locks (timeout 0), it
+#    just tries again on the next tick.
+#  - stats(): WAL size, checkpoint counts and results for /stats; "over_limit"
+#    flags a WAL that has grown past LG_WAL_WARN_MB (a reader that never lets
+#    go, or a writer that never pauses).
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from db_pool import BUSY_TIMEOUT_MS, ReadPool
+
+CHECKPOINT_INTERVAL = float(os.environ.get("LG_CHECKPOINT_INTERVAL", 5.0))   # seconds between ticks
+CHECKPOINT_IDLE     = float(os.environ.get("LG_CHECKPOINT_IDLE", 2.0))       # pool idle this long -> TRUNCATE
+WAL_LIMIT_MB        = int(os.environ.get("LG_WAL_LIMIT_MB", 64))             # journal_size_limit after a checkpoint
+WAL_WARN_MB         = int(os.environ.get("LG_WAL_WARN_MB", 256))
+
+
+def _tune(conn: sqlite3.Connection):
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA journal_size_limit = {WAL_LIMIT_MB * 1024 * 1024}")
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Read-write connection in WAL mode; for scripts that write the catalog."""
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    _tune(conn)
+    return conn
+
+
+def wal_bytes(db_path: str) -> int:
+    try:
+        return os.path.getsize(db_path + "-wal")
+    except OSError:
+        return 0
+
+
+class Checkpointer:
+    def __init__(self, path: str, pool: ReadPool, interval: float = CHECKPOINT_INTERVAL, idle: float = CHECKPOINT_IDLE):
+        self.path = path
+        self.pool = pool
+        self.interval = interval
+        self.idle = idle
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._size = 0
+        self._peak = 0
+        self._counts = {"passive": 0, "truncate": 0, "busy": 0, "errors": 0}
+        self._last: Optional[dict] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, name="lg-Checkpointer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except sqlite3.Error:
+                # File mid-swap or not migrated yet; reopen on the next tick
+                with self._lock:
+                    self._counts["errors"] += 1
+                self._close()
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def tick(self):
+        """One checkpoint attempt: PASSIVE under traffic, TRUNCATE when idle, nothing if the WAL is empty."""
+        size = wal_bytes(self.path)
+        with self._lock:
+            self._size = size
+            self._peak = max(self._peak, size)
+        if not size:
+            return
+        mode = "truncate" if self.pool.idle_seconds() >= self.idle else "passive"
+        if self._conn is None:
+            # Never waits on locks: a busy checkpoint is simply retried next tick
+            self._conn = sqlite3.connect(self.path, timeout=0, check_same_thread=False)
+            _tune(self._conn)
+        busy, log, done = self._conn.execute(f"PRAGMA wal_checkpoint({mode.upper()})").fetchone()
+        with self._lock:
+            self._counts[mode] += 1
+            self._counts["busy"] += busy
+            self._last = {"mode": mode, "busy": bool(busy), "wal_frames": log, "checkpointed": done}
+            self._size = wal_bytes(self.path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "wal_bytes": self._size,
+                "peak_wal_bytes": self._peak,
+                "over_limit": self._size > WAL_WARN_MB * 1024 * 1024,
+                "interval_s": self.interval,
+                "idle_s": self.idle,
+                **self._counts,
+                "last": self._last,
+            }